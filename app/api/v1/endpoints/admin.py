@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+
+from app.core.security import require_admin
+from app.db.schema_registry import schema_registry
+from app.db.session import get_async_db
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/schema")
+async def get_schema(db=Depends(get_async_db)):
+    """Tables and columns the app introspected at startup (or last refresh)"""
+    return (await schema_registry.get(db)).to_dict()
+
+
+@router.post("/schema/refresh")
+async def refresh_schema(db=Depends(get_async_db)):
+    """Re-introspect the schema, e.g. after running a migration"""
+    snapshot = await schema_registry.refresh(db)
+    return {
+        "tables": len(snapshot.tables),
+        "missing_required": snapshot.missing_tables(),
+        "missing_features": snapshot.to_dict()["missing_features"],
+    }
@@ -1,154 +1,373 @@
+import asyncio
 import json
-from typing import Any, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request, status
-from sqlalchemy.orm import Session
-from sqlalchemy import select
-
-from app.db.session import get_db
-from app.core.security import get_current_user  # adjust
-from app.models.course import Course            # adjust: your Course model/table uses course_id, course_name, price, level
-from app.models.course_asset import CourseAsset # the new table we discussed
-from app.services.storage_gcs import upload_file_to_gcs
-from app.utils.youtube import extract_youtube_id  # you can place helper anywhere
+import re
+import uuid
+from decimal import Decimal, InvalidOperation
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import insert, text
+
+from app.api.v1.endpoints.courses import catalog_cache
+from app.core.security import CurrentUser, require_admin
+from app.db.models import CourseAsset
+from app.db.schema_registry import schema_registry
+from app.db.session import get_async_db
+from app.services.course_ingest import (
+    AssetProgress,
+    IngestJob,
+    IngestQueueFull,
+    asset_insert_rows,
+    course_insert,
+    ingest_queue,
+    stored_columns,
+)
+from app.services.course_search import invalidate_search_index
+from app.services.storage import get_storage
+from app.services.upload_pipeline import (
+    UploadPipe,
+    abort_all,
+    delete_objects,
+    settle,
+    stream_multipart,
+    upload_executor,
+)
+from app.utils.youtube import extract_youtube_id
 
 router = APIRouter(prefix="/admin/courses", tags=["Admin Courses"])
 
+_UNSAFE_NAME_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+_SHA256_HEX = re.compile(r"[0-9a-f]{64}")
+
+# Seconds a client should wait when the ingestion queue is full
+INGEST_RETRY_AFTER = 5
+
+ASSET_SOURCE_COLUMNS = (
+    "url", "youtube_id", "gcs_bucket", "gcs_object", "file_url", "mime_type", "size_bytes", "content_sha256",
+)
+
+# Latest stored copy of each declared hash in the current bucket
+KNOWN_CONTENT_SQL = text("""
+    SELECT DISTINCT ON (content_sha256)
+           content_sha256, gcs_bucket, gcs_object, file_url, mime_type, size_bytes
+    FROM imc.course_assets
+    WHERE content_sha256 = ANY(:hashes) AND gcs_bucket = :bucket
+    ORDER BY content_sha256, asset_id DESC
+""")
+
+# The body is parsed by hand (streamed), so describe it for /docs
+SUBMIT_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["payload"],
+                    "properties": {
+                        "payload": {
+                            "type": "string",
+                            "description": (
+                                "JSON {course, assets}; must be the first part. An upload "
+                                "asset may declare its sha256 and omit its file part when "
+                                "the server already stores that content"
+                            ),
+                        },
+                    },
+                    "additionalProperties": {"type": "string", "format": "binary"},
+                }
+            }
+        },
+    }
+}
+
+
+def _invalidate_catalog() -> None:
+    catalog_cache.clear()
+    invalidate_search_index()
+
+
+# Job-mode submissions commit on a worker thread
+ingest_queue.add_finish_listener(lambda job: _invalidate_catalog())
+
+
+def _safe_filename(filename: str) -> str:
+    name = filename.replace("\\", "/").rsplit("/", 1)[-1]
+    return _UNSAFE_NAME_CHARS.sub("_", name).strip("._") or "file"
+
+
+def _parse_price(value: Any) -> Decimal | None:
+    # Bound to a NUMERIC column; asyncpg refuses strings there, so convert here
+    if value is None or value == "":
+        return None
+    try:
+        price = Decimal(str(value))
+    except InvalidOperation:
+        price = None
+    if price is None or not price.is_finite() or price < 0:
+        raise HTTPException(status_code=400, detail="course.price must be a non-negative number")
+    return price
+
+
+def _parse_sort_order(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="asset sort_order must be an integer")
+
+
+def _parse_payload(raw: str) -> dict[str, Any]:
+    """Validate the JSON payload up front, before any file is read."""
+    try:
+        data = json.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid JSON in payload")
+
+    course_data = data.get("course") or {}
+    course_name = (course_data.get("course_name") or "").strip()
+    if not course_name:
+        raise HTTPException(status_code=400, detail="course.course_name is required")
+
+    rows: list[dict[str, Any]] = []
+    uploads: dict[str, dict[str, Any]] = {}
+    declared: dict[str, str] = {}
+    for a in data.get("assets") or []:
+        asset_kind = (a.get("asset_kind") or "").lower().strip()  # video/pdf
+        source_type = (a.get("source_type") or "").lower().strip()  # upload/youtube
+        if asset_kind not in {"video", "pdf"}:
+            raise HTTPException(status_code=400, detail=f"Invalid asset_kind: {asset_kind}")
+        if source_type not in {"upload", "youtube"}:
+            raise HTTPException(status_code=400, detail=f"Invalid source_type: {source_type}")
+
+        # Every row carries every column so they insert as one executemany
+        row = {
+            "asset_kind": asset_kind,
+            "source_type": source_type,
+            "title": a.get("title"),
+            "sort_order": _parse_sort_order(a.get("sort_order")),
+            **dict.fromkeys(ASSET_SOURCE_COLUMNS),
+        }
+        if source_type == "youtube":
+            url = (a.get("url") or "").strip()
+            yt_id = extract_youtube_id(url)
+            if not yt_id:
+                raise HTTPException(status_code=400, detail="Invalid YouTube URL")
+            row.update(asset_kind="video", url=url, youtube_id=yt_id)
+        else:
+            file_key = (a.get("file_key") or "").strip()
+            if not file_key:
+                raise HTTPException(status_code=400, detail="upload asset missing file_key")
+            if file_key in uploads:
+                raise HTTPException(status_code=400, detail=f"Duplicate file_key={file_key}")
+            sha256 = (a.get("sha256") or "").strip().lower()
+            if sha256:
+                if not _SHA256_HEX.fullmatch(sha256):
+                    raise HTTPException(status_code=400, detail=f"Invalid sha256 for file_key={file_key}")
+                declared[file_key] = sha256
+            uploads[file_key] = row
+        rows.append(row)
 
-def require_admin():
-    return {"role": "admin", "id": 1}
+    return {
+        "course": {
+            "course_name": course_name,
+            "price": _parse_price(course_data.get("price")),
+            "level": course_data.get("level"),
+        },
+        "rows": rows,
+        "uploads": uploads,
+        "declared": declared,
+    }
 
 
-@router.post("/submit", status_code=status.HTTP_201_CREATED)
+async def _reuse_known_content(db, storage, declared: dict[str, str]) -> dict[str, dict[str, Any]]:
+    """
+    Stored-object columns for the file keys whose declared sha256 is already
+    in storage, so the client need not send those files at all.
+    """
+    if not declared:
+        return {}
+    try:
+        rows = (await db.execute(
+            KNOWN_CONTENT_SQL, {"hashes": sorted(set(declared.values())), "bucket": storage.bucket}
+        )).mappings().all()
+    finally:
+        # Don't sit in an open read transaction while the uploads finish
+        await db.rollback()
+    # The row is only a hint; make sure the object is still there
+    loop = asyncio.get_running_loop()
+    present = await asyncio.gather(
+        *(loop.run_in_executor(upload_executor, storage.exists, row["gcs_object"]) for row in rows)
+    )
+    known = {row["content_sha256"]: dict(row) for row, ok in zip(rows, present) if ok}
+    return {key: known[sha256] for key, sha256 in declared.items() if sha256 in known}
+
+
+@router.post("/submit", status_code=status.HTTP_201_CREATED, openapi_extra=SUBMIT_OPENAPI)
 async def submit_course(
     request: Request,
-    payload: str = Form(...),
-    # allow multiple files under arbitrary keys
-    db: Session = Depends(get_db),
-    admin=Depends(require_admin),
+    response: Response,
+    mode: str = Query("sync", pattern="^(sync|job)$"),
+    db=Depends(get_async_db),
+    admin: CurrentUser = Depends(require_admin),
 ):
     """
     One API does everything:
     - Create course
-    - Upload files to GCS (pdf/mp4)
+    - Stream uploaded files (pdf/mp4) to storage, several at a time
     - Insert course_assets (upload/youtube)
-    All inside a DB transaction.
+    The course and asset rows are committed only after every upload succeeded.
+
+    Multipart body: a `payload` JSON field first, then one file part per
+    upload asset, named by its `file_key`.
+
+    Files are stored once per content hash: an upload identical to one
+    already stored is not kept twice, and an asset that declares a known
+    `sha256` may leave out its file part entirely.
+
+    With `mode=job` the files are only staged on local disk and the response
+    is 202 with a job id; a background worker uploads them and creates the
+    course. Poll GET /admin/courses/jobs/{job_id} for progress.
     """
+    if not await schema_registry.feature_ready(db, "assets"):
+        raise HTTPException(status_code=503, detail="Course assets are not available yet")
+    job_mode = mode == "job"
+    if job_mode:
+        if not ingest_queue.running:
+            raise HTTPException(status_code=503, detail="Ingestion workers are not running")
+        # Refuse before reading a body that would overflow the staging area
+        if not ingest_queue.has_room(int(request.headers.get("content-length") or 0)):
+            raise HTTPException(
+                status_code=503,
+                detail="Too many course submissions in progress",
+                headers={"Retry-After": str(INGEST_RETRY_AFTER)},
+            )
+    storage = ingest_queue.staging if job_mode else get_storage()
+    # Groups this submission's staged files
+    submission = uuid.uuid4().hex
+    plan: dict[str, Any] = {}
+    pipe_keys: dict[UploadPipe, str] = {}
 
-    # ---- 1) Parse JSON payload
-    try:
-        data = json.loads(payload)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid JSON in payload")
+    async def on_field(name: str, value: str) -> None:
+        if name == "payload":
+            if plan:
+                raise HTTPException(status_code=400, detail="payload given twice")
+            plan.update(_parse_payload(value))
 
-    course_data = data.get("course") or {}
-    assets = data.get("assets") or []
+    async def on_file(name: str, filename: str, content_type: str) -> UploadPipe:
+        if not plan:
+            raise HTTPException(status_code=400, detail="payload must be the first form field")
+        row = plan["uploads"].get(name)
+        if row is None:
+            raise HTTPException(status_code=400, detail=f"Unexpected file field {name}")
+        if name in pipe_keys.values():
+            raise HTTPException(status_code=400, detail=f"File for file_key={name} sent twice")
 
-    # ---- 2) Basic course validation (align with your ERD: courses(course_name, price, level))
-    course_name = (course_data.get("course_name") or "").strip()
-    if not course_name:
-        raise HTTPException(status_code=400, detail="course.course_name is required")
+        # validate content type before reading the file
+        ctype = (content_type or "").lower()
+        if row["asset_kind"] == "pdf" and ctype != "application/pdf":
+            raise HTTPException(status_code=400, detail=f"{name} must be a PDF")
+        if row["asset_kind"] == "video" and not ctype.startswith("video/"):
+            raise HTTPException(status_code=400, detail=f"{name} must be a video file")
 
-    price = course_data.get("price")
-    level = course_data.get("level")
+        # Stored under its content hash; staged files need a name of their own
+        object_name = None
+        if job_mode:
+            object_name = (
+                f"courses/submissions/{submission}/{row['asset_kind']}/"
+                f"{_safe_filename(name)}/{_safe_filename(filename or name)}"
+            )
+        pipe = UploadPipe(storage, object_name, content_type or "application/octet-stream")
+        pipe_keys[pipe] = name
+        return pipe
 
-    # ---- 3) Collect uploaded files by form key
-    # This grabs ALL form files regardless of name
-    form = await request.form()
-    uploaded_files: dict[str, UploadFile] = {}
-    for key, value in form.multi_items():
-        if isinstance(value, UploadFile):
-            uploaded_files[key] = value
+    # ---- 1) Stream the body: payload, then files straight to storage
+    pipes = await stream_multipart(request, on_field, on_file)
 
-    # ---- 4) Begin transaction: create course + assets
+    # ---- 2) Every declared upload must have arrived, then wait for all of them
+    if not plan:
+        await abort_all(pipes)
+        raise HTTPException(status_code=400, detail="payload is required")
+    sent = set(pipe_keys.values())
     try:
-        # Create course
-        course = Course(
-            course_name=course_name,
-            price=price,
-            level=level,
+        reused = await _reuse_known_content(
+            db, get_storage(), {key: sha256 for key, sha256 in plan["declared"].items() if key not in sent}
         )
-        db.add(course)
-        db.flush()  # ensures course.course_id available without committing
-
-        # Create assets
-        for a in assets:
-            asset_kind = (a.get("asset_kind") or "").lower().strip()  # video/pdf
-            source_type = (a.get("source_type") or "").lower().strip()  # upload/youtube
-            title = a.get("title")
-            sort_order = int(a.get("sort_order") or 0)
-
-            if asset_kind not in {"video", "pdf"}:
-                raise HTTPException(status_code=400, detail=f"Invalid asset_kind: {asset_kind}")
-            if source_type not in {"upload", "youtube"}:
-                raise HTTPException(status_code=400, detail=f"Invalid source_type: {source_type}")
-
-            if source_type == "youtube":
-                url = (a.get("url") or "").strip()
-                yt_id = extract_youtube_id(url)
-                if not yt_id:
-                    raise HTTPException(status_code=400, detail="Invalid YouTube URL")
-
-                asset = CourseAsset(
-                    course_id=course.course_id,
-                    asset_kind="video",
-                    source_type="youtube",
-                    title=title,
-                    sort_order=sort_order,
-                    url=url,
-                    youtube_id=yt_id,
-                    created_by=getattr(admin, "user_id", None) or getattr(admin, "id", None),
-                )
-                db.add(asset)
-
-            else:
-                # upload
-                file_key = (a.get("file_key") or "").strip()
-                if not file_key:
-                    raise HTTPException(status_code=400, detail="upload asset missing file_key")
-
-                up = uploaded_files.get(file_key)
-                if not up:
-                    raise HTTPException(status_code=400, detail=f"Missing file for file_key={file_key}")
-
-                # validate content type
-                ctype = (up.content_type or "").lower()
-                if asset_kind == "pdf" and ctype != "application/pdf":
-                    raise HTTPException(status_code=400, detail=f"{file_key} must be a PDF")
-                if asset_kind == "video" and not ctype.startswith("video/"):
-                    raise HTTPException(status_code=400, detail=f"{file_key} must be a video file")
-
-                meta = upload_file_to_gcs(
-                    course_id=course.course_id,
-                    asset_type=asset_kind,
-                    filename=up.filename or file_key,
-                    fileobj=up.file,
-                    content_type=up.content_type or "application/octet-stream",
-                )
+    except BaseException:
+        await abort_all(pipes)
+        raise
+    missing = [key for key in plan["uploads"] if key not in sent and key not in reused]
+    if missing:
+        await abort_all(pipes)
+        raise HTTPException(status_code=400, detail=f"Missing file for file_key={missing[0]}")
+    for key, columns in reused.items():
+        plan["uploads"][key].update(columns)
 
-                asset = CourseAsset(
-                    course_id=course.course_id,
-                    asset_kind=asset_kind,
-                    source_type="upload",
-                    title=title,
-                    sort_order=sort_order,
-                    gcs_bucket=meta["bucket"],
-                    gcs_object=meta["object_name"],
-                    file_url=meta["public_url"],
-                    mime_type=meta["content_type"],
-                    size_bytes=meta["size"],
-                    created_by=getattr(admin, "user_id", None) or getattr(admin, "id", None),
-                )
-                db.add(asset)
+    try:
+        stored = await settle(pipes)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Upload failed: {str(e)}")
 
-        db.commit()
+    if job_mode:
+        job = IngestJob(
+            plan=plan,
+            assets=[
+                AssetProgress(
+                    file_key=pipe_keys[pipe],
+                    row=plan["uploads"][pipe_keys[pipe]],
+                    staged_object=meta.object_name,
+                    content_type=meta.content_type,
+                    size=meta.size,
+                )
+                for pipe, meta in zip(pipes, stored)
+            ],
+            created_by=admin.user_id,
+        )
+        try:
+            ingest_queue.submit(job)
+        except IngestQueueFull:
+            await delete_objects(stored, pipes)
+            raise HTTPException(
+                status_code=503,
+                detail="Too many course submissions in progress",
+                headers={"Retry-After": str(INGEST_RETRY_AFTER)},
+            )
+        response.status_code = status.HTTP_202_ACCEPTED
         return {
-            "course_id": course.course_id,
-            "message": "Course submitted successfully",
+            "job_id": job.job_id,
+            "status": job.status,
+            "status_url": str(request.url_for("get_ingest_job", job_id=job.job_id).path),
         }
 
-    except HTTPException:
-        db.rollback()
-        raise
+    for pipe, meta in zip(pipes, stored):
+        plan["uploads"][pipe_keys[pipe]].update(stored_columns(meta))
+
+    # ---- 3) One short transaction for the course + asset rows
+    try:
+        course_id = (await db.execute(course_insert(plan))).scalar()
+        if plan["rows"]:
+            await db.execute(insert(CourseAsset), asset_insert_rows(plan, course_id, admin.user_id))
+        await db.commit()
     except Exception as e:
-        db.rollback()
+        await db.rollback()
+        await delete_objects(stored, pipes)
         raise HTTPException(status_code=500, detail=f"Submit failed: {str(e)}")
+
+    _invalidate_catalog()
+
+    return {
+        "course_id": course_id,
+        "message": "Course submitted successfully",
+        # Files that were already stored: skipped by the client or deduplicated on commit
+        "reused_files": sorted(
+            [*reused, *(pipe_keys[pipe] for pipe, meta in zip(pipes, stored) if meta.deduplicated)]
+        ),
+    }
+
+
+@router.get("/jobs/{job_id}", name="get_ingest_job")
+def get_ingest_job(job_id: str, admin: CurrentUser = Depends(require_admin)):
+    """Status of a mode=job submission, with per-asset upload progress."""
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
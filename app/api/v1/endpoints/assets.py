@@ -0,0 +1,93 @@
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import text
+
+from app.core.security import CurrentUser, get_current_user, has_admin_role
+from app.db.schema_registry import schema_registry
+from app.db.session import get_async_db
+from app.services.asset_delivery import issue_asset_url, media_file_response
+from app.services.storage import LocalStorage, StorageError, get_storage
+
+router = APIRouter()
+
+# The asset plus whether the caller, or a child linked to the caller, has an
+# active enrollment in its course - one round trip for lookup and access check
+ASSET_ACCESS_SQL = text("""
+    SELECT a.asset_id, a.source_type, a.url, a.youtube_id, a.gcs_bucket, a.gcs_object,
+           a.mime_type, a.size_bytes, a.title,
+           EXISTS (
+               SELECT 1
+               FROM imc.enrollments e
+               WHERE e.course_id = a.course_id
+                 AND e.status = 'active'
+                 AND (e.user_id = :user_id OR e.user_id IN (
+                     SELECT student_user_id FROM imc.parent_student WHERE parent_user_id = :user_id
+                 ))
+           ) AS enrolled
+    FROM imc.course_assets a
+    WHERE a.asset_id = :asset_id
+""")
+
+
+@router.get("/assets/{asset_id}")
+async def get_asset_url(asset_id: int, user: CurrentUser = Depends(get_current_user), db=Depends(get_async_db)):
+    """
+    Short-lived URL for playing or downloading a course asset.
+
+    Fetch the bytes from `url` directly (it supports Range requests) until
+    `expires_at`, then ask again. YouTube assets return their link.
+    """
+    if not await schema_registry.feature_ready(db, "assets"):
+        raise HTTPException(status_code=503, detail="Course assets are not available yet")
+    asset = (await db.execute(
+        ASSET_ACCESS_SQL, {"asset_id": asset_id, "user_id": user.user_id}
+    )).mappings().first()
+    if not asset:
+        raise HTTPException(status_code=404, detail="Asset not found")
+    if not (asset["enrolled"] or await has_admin_role(db, user)):
+        raise HTTPException(status_code=403, detail="Not enrolled in this course")
+
+    result = {
+        "asset_id": asset["asset_id"],
+        "source_type": asset["source_type"],
+        "title": asset["title"],
+        "mime_type": asset["mime_type"],
+        "size_bytes": asset["size_bytes"],
+    }
+    if asset["source_type"] == "youtube":
+        return {**result, "url": asset["url"], "youtube_id": asset["youtube_id"], "expires_at": None}
+
+    storage = get_storage()
+    # Rows written under another backend (e.g. local dev data) are not readable here
+    if not asset["gcs_object"] or asset["gcs_bucket"] != storage.bucket:
+        raise HTTPException(status_code=404, detail="Asset file is not available")
+    url, expires_at = await issue_asset_url(
+        storage, asset["gcs_object"], user.user_id, asset["mime_type"] or "application/octet-stream"
+    )
+    return {**result, "url": url, "expires_at": expires_at}
+
+
+@router.api_route("/media/{object_name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+def get_media(
+    object_name: str,
+    request: Request,
+    u: int = Query(...),
+    exp: int = Query(...),
+    type: str = Query(...),
+    sig: str = Query(...),
+):
+    """Local-storage reads through URLs signed by GET /assets/{asset_id}."""
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+    now = int(time.time())
+    if exp < now or not storage.verify_signature(object_name, exp, u, type, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired media URL")
+    try:
+        path = storage.path_for(object_name)
+    except StorageError:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Not found")
+    return media_file_response(request, path, type, max_age=exp - now)
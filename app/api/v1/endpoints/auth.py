@@ -5,14 +5,19 @@ from starlette.requests import Request
 import os
 from app.schemas.auth import RegisterRequest, RegisterResponse
 from sqlalchemy import text
-from sqlalchemy.orm import Session
 
 from app.schemas.auth import (
     LoginRequest, LoginResponse,
     RegisterRequest, RegisterResponse
 )
-from app.auth import verify_password, create_access_token, get_password_hash
-from app.db.session import get_db
+from app.auth import (
+    KDFPoolBusy, create_access_token, hash_password_async, normalize_email,
+    verify_and_update_password_async
+)
+from app.core.config import KDF_RETRY_AFTER
+from app.db.schema_registry import schema_registry
+from app.db.session import get_async_db
+from app.services.role_registry import DEFAULT_ROLE, role_registry
 
 router = APIRouter()
 
@@ -26,34 +31,51 @@ oauth.register(
     client_kwargs={'scope': 'openid email profile'},
 )
 
+def _kdf_busy() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Too many sign-in requests, please retry shortly.",
+        headers={"Retry-After": str(KDF_RETRY_AFTER)},
+    )
+
+
 @router.post("/login", response_model=LoginResponse)
-def login(payload: LoginRequest, db: Session = Depends(get_db)):
-    user = db.execute(
+async def login(payload: LoginRequest, db=Depends(get_async_db)):
+    user = (await db.execute(
         text("""
-            SELECT user_id, email, password_hash, first_name, last_name
-            FROM imc.users
-            WHERE lower(email) = lower(:email)
+            SELECT
+                u.user_id, u.email, u.password_hash, u.first_name, u.last_name,
+                (SELECT ur.role_id FROM imc.user_roles ur WHERE ur.user_id = u.user_id LIMIT 1) AS role_id
+            FROM imc.users u
+            WHERE lower(u.email) = :email
             LIMIT 1
         """),
-        {"email": payload.email},
-    ).mappings().first()
+        {"email": normalize_email(payload.email)},
+    )).mappings().first()
 
     if not user or not user.get("password_hash"):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    if not verify_password(payload.password, user["password_hash"]):
+    try:
+        valid, new_hash = await verify_and_update_password_async(payload.password, user["password_hash"])
+    except KDFPoolBusy:
+        raise _kdf_busy()
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    role = db.execute(
-        text("""
-            SELECT r.role_name
-            FROM imc.user_roles ur
-            JOIN imc.roles r ON r.role_id = ur.role_id
-            WHERE ur.user_id = :uid
-            LIMIT 1
-        """),
-        {"uid": user["user_id"]},
-    ).scalar() or "student"
+    if new_hash:
+        # Legacy scheme or rounds: store the hash at the current parameters.
+        # Matching the old hash keeps a concurrent password change intact.
+        await db.execute(
+            text("""
+                UPDATE imc.users SET password_hash = :new_hash
+                WHERE user_id = :uid AND password_hash = :old_hash
+            """),
+            {"new_hash": new_hash, "uid": user["user_id"], "old_hash": user["password_hash"]},
+        )
+        await db.commit()
+
+    role = await role_registry.role_name(db, user["role_id"])
 
     token = create_access_token(
         subject=str(user["user_id"]),
@@ -78,93 +100,84 @@ def login_options() -> Response:
     # 204 No Content is typical for preflight responses
     return Response(status_code=204)
 
-def _users_table_columns(db: Session) -> set[str]:
-    rows = db.execute(
-        text("""
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema='imc' AND table_name='users'
-        """)
-    ).scalars().all()
-    return set(rows)
+# Profile columns register fills in when the deployed users table has them
+OPTIONAL_USER_COLUMNS = ("phone", "dob", "gender", "address")
 
 
 @router.post("/register", response_model=RegisterResponse, status_code=201)
-def register(payload: RegisterRequest, db: Session = Depends(get_db)):
-    email = payload.email.lower().strip()
+async def register(payload: RegisterRequest, db=Depends(get_async_db)):
+    email = normalize_email(payload.email)
 
-    # 1) Duplicate email check
-    existing = db.execute(
-        text("""
-            SELECT user_id
-            FROM imc.users
-            WHERE lower(email) = lower(:email)
-            LIMIT 1
-        """),
-        {"email": email},
-    ).scalar()
-    if existing:
-        raise HTTPException(status_code=409, detail="Email already registered.")
-
-    # 2) Resolve role (prefer role_id else role_name; safe allowlist)
+    # 1) Resolve role (prefer role_id else role_name; safe allowlist)
     allowed_roles = {"parent", "student"}
-    role_row = None
+    role = None
 
     if payload.role_id is not None:
-        role_row = db.execute(
-            text("""SELECT role_id, role_name FROM imc.roles WHERE role_id = :rid LIMIT 1"""),
-            {"rid": payload.role_id},
-        ).mappings().first()
+        role = await role_registry.lookup(db, role_id=payload.role_id)
     else:
         requested = (payload.role_name or "student").strip().lower()
         if requested not in allowed_roles:
             raise HTTPException(status_code=400, detail="role_name must be parent or student.")
-        role_row = db.execute(
-            text("""SELECT role_id, role_name FROM imc.roles WHERE role_name = :rn LIMIT 1"""),
-            {"rn": requested},
-        ).mappings().first()
+        role = await role_registry.lookup(db, role_name=requested)
 
-    if not role_row:
+    if not role:
         raise HTTPException(status_code=400, detail="Invalid role (not found in roles table).")
+    # A role_id can name any role, admin included; self-signup gets only these
+    if role.role_name.strip().lower() not in allowed_roles:
+        raise HTTPException(status_code=400, detail="role must be parent or student.")
 
-    role_id = role_row["role_id"]
-    role_name = role_row["role_name"]
-
-    # 3) Insert user using your REAL schema
-    pw_hash = get_password_hash(payload.password)
+    role_id = role.role_id
+    role_name = role.role_name
 
-    user_row = db.execute(
-        text("""
-            INSERT INTO imc.users (first_name, last_name, email, phone, dob, gender, address, password_hash)
-            VALUES (:first_name, :last_name, :email, :phone, :dob, :gender, :address, :password_hash)
-            RETURNING user_id, email
-        """),
-        {
-            "first_name": payload.first_name.strip(),
-            "last_name": payload.last_name.strip(),
-            "email": email,
-            "phone": payload.phone.strip() if payload.phone else None,
-            "dob": payload.dob,  # should be "YYYY-MM-DD" from UI
-            "gender": payload.gender,
-            "address": payload.address.strip() if payload.address else None,
-            "password_hash": pw_hash,
-        },
-    ).mappings().first()
+    try:
+        pw_hash = await hash_password_async(payload.password)
+    except KDFPoolBusy:
+        raise _kdf_busy()
 
-    user_id = user_row["user_id"]
+    values = {
+        "first_name": payload.first_name.strip(),
+        "last_name": payload.last_name.strip(),
+        "email": email,
+        "password_hash": pw_hash,
+        "phone": payload.phone.strip() if payload.phone else None,
+        "dob": payload.dob,  # parsed from "YYYY-MM-DD"; asyncpg binds DATE only from a date
+        "gender": payload.gender,
+        "address": payload.address.strip() if payload.address else None,
+    }
+    # Older deployments lack some profile columns; the schema registry knows which
+    user_columns = (await schema_registry.get(db)).columns("users")
+    columns = [c for c in values if c not in OPTIONAL_USER_COLUMNS or c in user_columns]
 
-    # 4) Insert into user_roles
-    db.execute(
-        text("""
-            INSERT INTO imc.user_roles (user_id, role_id)
-            VALUES (:uid, :rid)
+    # 2) Insert user + user_roles in one statement. ON CONFLICT on the unique
+    # lower(email) index makes the duplicate check atomic: of two concurrent
+    # signups for one email exactly one gets a row back. That index
+    # (imc.users_email_lower_key, scripts/add_email_lower_index.py) is a
+    # prerequisite; without it Postgres rejects this statement. Any other
+    # unique violation still raises instead of passing for a duplicate email.
+    user_id = (await db.execute(
+        text(f"""
+            WITH new_user AS (
+                INSERT INTO imc.users ({", ".join(columns)})
+                VALUES ({", ".join(":" + c for c in columns)})
+                ON CONFLICT ((lower(email))) DO NOTHING
+                RETURNING user_id
+            ),
+            new_role AS (
+                INSERT INTO imc.user_roles (user_id, role_id)
+                SELECT user_id, :rid FROM new_user
+            )
+            SELECT user_id FROM new_user
         """),
-        {"uid": user_id, "rid": role_id},
-    )
+        {**{c: values[c] for c in columns}, "rid": role_id},
+    )).scalar()
 
-    db.commit()
+    if user_id is None:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Email already registered.")
 
-    # 5) Auto-login token
+    await db.commit()
+
+    # 3) Auto-login token
     token = create_access_token(
         subject=str(user_id),
         extra={"role": role_name, "email": email},
@@ -191,7 +204,7 @@ async def google_login(request: Request):
 
 
 @router.get("/google/callback")
-async def google_callback(request: Request, db: Session = Depends(get_db)):
+async def google_callback(request: Request, db=Depends(get_async_db)):
     """Handle Google OAuth callback"""
     try:
         token = await oauth.google.authorize_access_token(request)
@@ -203,36 +216,34 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
         email = user_info.get('email')
         if not email:
             raise HTTPException(status_code=400, detail="Email not provided by Google")
+        email = normalize_email(email)
         
         # Check if user exists
-        existing_user = db.execute(
-            text("SELECT user_id, first_name, last_name FROM imc.users WHERE lower(email) = lower(:email) LIMIT 1"),
+        existing_user = (await db.execute(
+            text("""
+                SELECT
+                    u.user_id, u.first_name, u.last_name,
+                    (SELECT ur.role_id FROM imc.user_roles ur WHERE ur.user_id = u.user_id LIMIT 1) AS role_id
+                FROM imc.users u
+                WHERE lower(u.email) = :email
+                LIMIT 1
+            """),
             {"email": email}
-        ).mappings().first()
+        )).mappings().first()
         
         if existing_user:
             user_id = existing_user['user_id']
             first_name = existing_user.get('first_name', '')
             last_name = existing_user.get('last_name', '')
             
-            # Get user role
-            role = db.execute(
-                text("""
-                    SELECT r.role_name
-                    FROM imc.user_roles ur
-                    JOIN imc.roles r ON r.role_id = ur.role_id
-                    WHERE ur.user_id = :uid
-                    LIMIT 1
-                """),
-                {"uid": user_id}
-            ).scalar() or "student"
+            role = await role_registry.role_name(db, existing_user['role_id'])
         else:
             # Create new user
             name_parts = user_info.get('name', email.split('@')[0]).split(' ', 1)
             first_name = name_parts[0] if name_parts else email.split('@')[0]
             last_name = name_parts[1] if len(name_parts) > 1 else ""
             
-            user_row = db.execute(
+            user_row = (await db.execute(
                 text("""
                     INSERT INTO imc.users (first_name, last_name, email, password_hash)
                     VALUES (:first_name, :last_name, :email, :password_hash)
@@ -244,23 +255,21 @@ async def google_callback(request: Request, db: Session = Depends(get_db)):
                     "email": email,
                     "password_hash": "",  # No password for OAuth users
                 }
-            ).mappings().first()
+            )).mappings().first()
             
             user_id = user_row['user_id']
             
             # Assign default role (student)
-            role_row = db.execute(
-                text("SELECT role_id FROM imc.roles WHERE role_name = 'student' LIMIT 1")
-            ).scalar()
+            default_role = await role_registry.lookup(db, role_name=DEFAULT_ROLE)
             
-            if role_row:
-                db.execute(
+            if default_role:
+                await db.execute(
                     text("INSERT INTO imc.user_roles (user_id, role_id) VALUES (:uid, :rid)"),
-                    {"uid": user_id, "rid": role_row}
+                    {"uid": user_id, "rid": default_role.role_id}
                 )
             
-            role = "student"
-            db.commit()
+            role = DEFAULT_ROLE
+            await db.commit()
         
         # Create JWT token
         access_token = create_access_token(
@@ -1,77 +1,181 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import base64
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from sqlalchemy import literal_column, select, text
 from sqlalchemy.orm import Session
-from sqlalchemy import text
 from typing import List, Optional
 
-from app.db.session import get_db
+from app.core.cache import TTLCache
+from app.core.config import CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL
+from app.core.etag import conditional_response, not_modified, render, version_etag
+from app.core.serialization import RowProjection
+from app.core.security import require_admin
+from app.db.session import get_async_db, get_db
 from app.db.models import Course
 from app.schemas.course import CourseOut, CourseCreate, CourseUpdate
+from app.services.course_search import invalidate_search_index, search_courses
 
 router = APIRouter()
 
+# Rendered course payloads (body + ETag), keyed by
+# ("list", limit, offset, active_only, search),
+# ("page", limit, after_id, after_score, active_only, search) and
+# ("course", course_id). Every write below clears it.
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+# Version of the whole catalog for ETags: an insert, update or delete changes
+# the row count or a row's xmin (the writing transaction id), and so the sum.
+# Far cheaper than the list queries plus serialization it lets a
+# revalidation skip.
+CATALOG_VERSION_SQL = text("SELECT count(*), sum(xmin::text::bigint) FROM imc.courses")
+
+# Column-projected reads produce the same dicts as CourseOut(...).model_dump(by_alias=True)
+COURSE_PROJECTION = RowProjection(CourseOut, Course)
+_ID = COURSE_PROJECTION.index("id")
+
+
+def _encode_cursor(last_course_id: int, score: Optional[float] = None) -> str:
+    payload = {"id": last_course_id}
+    if score is not None:
+        payload["score"] = score
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[int, Optional[float]]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded))
+        score = payload.get("score")
+        return int(payload["id"]), float(score) if score is not None else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.get("")
-def list_courses(
-    db: Session = Depends(get_db),
+async def list_courses(
+    request: Request,
+    db=Depends(get_async_db),
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
     active_only: bool = False,
     search: Optional[str] = None,
+    pagination: str = Query("offset", pattern="^(offset|cursor)$"),
+    cursor: Optional[str] = None,
 ):
-    q = db.query(Course)
-
-    if active_only:
-        q = q.filter(Course.is_active.is_(True))
-
+    """
+    List courses, newest first, or by relevance when `search` is given.
+
+    Offset mode (default) returns a plain list. Cursor mode
+    (`pagination=cursor`, or any `cursor` value) seeks past the last seen
+    row instead of skipping rows and returns
+    `{"items": [...], "next_cursor": str | null}`.
+
+    Responses carry an ETag; a matching If-None-Match gets a 304.
+    """
+    search = search.strip() if search else None
+    use_cursor = pagination == "cursor" or cursor is not None
+    after_id, after_score = _decode_cursor(cursor) if cursor else (None, None)
+    if search and after_id is not None and after_score is None:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if use_cursor:
+        cache_key = ("page", limit, after_id, after_score, active_only, search)
+    else:
+        cache_key = ("list", limit, offset, active_only, search)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+    generation = catalog_cache.generation
+
+    version = tuple((await db.execute(CATALOG_VERSION_SQL)).one())
+    etag = version_etag(version, cache_key)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    scores = {}
     if search:
-        like = f"%{search.strip()}%"
-        q = q.filter(Course.course_name.ilike(like))
-
-    courses = q.order_by(Course.course_id.desc()).offset(offset).limit(limit).all()
-    
-    # Fetch actual chapter counts for all courses
-    course_ids = [c.course_id for c in courses]
-    chapter_counts = {}
-    
-    if course_ids:
-        result = db.execute(text("""
-            SELECT course_id, COUNT(*) as chapter_count
-            FROM imc.course_chapters
-            WHERE course_id = ANY(:course_ids)
-            GROUP BY course_id
-        """), {"course_ids": course_ids})
-        
-        for row in result:
-            chapter_counts[row[0]] = row[1]
-    
-    # Convert to output format and inject actual chapter count
-    output = []
-    for c in courses:
-        course_dict = CourseOut.model_validate(c).model_dump(by_alias=True)
-        # Override lessons_count with actual chapter count
-        course_dict['lessons'] = chapter_counts.get(c.course_id, 0)
-        output.append(course_dict)
-    
-    return output
+        ranked = await search_courses(
+            db,
+            search,
+            active_only=active_only,
+            limit=limit + 1 if use_cursor else limit,
+            offset=offset,
+            after=(after_score, after_id) if use_cursor and after_id is not None else None,
+        )
+        scores = dict(ranked)
+        by_id = {}
+        if scores:
+            result = await db.execute(
+                select(*COURSE_PROJECTION.columns).where(Course.course_id.in_(list(scores)))
+            )
+            by_id = {row[_ID]: row for row in result.all()}
+        rows = [by_id[cid] for cid, _ in ranked if cid in by_id]
+    else:
+        q = select(*COURSE_PROJECTION.columns)
+
+        if active_only:
+            q = q.where(Course.is_active.is_(True))
+
+        q = q.order_by(Course.course_id.desc())
+        if use_cursor and after_id is not None:
+            q = q.where(Course.course_id < after_id)
+        if use_cursor:
+            # One extra row tells us whether another page exists
+            q = q.limit(limit + 1)
+        else:
+            q = q.offset(offset).limit(limit)
+        rows = (await db.execute(q)).all()
+
+    if use_cursor:
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+    output = COURSE_PROJECTION.to_dicts(rows)
+
+    if use_cursor:
+        last_id = rows[-1][_ID] if rows else None
+        output = {
+            "items": output,
+            "next_cursor": _encode_cursor(last_id, scores.get(last_id)) if has_more else None,
+        }
+
+    rendered = render(output, etag)
+    catalog_cache.set(cache_key, rendered, generation=generation)
+    return conditional_response(request, rendered)
+
+
+@router.get("/cache/stats", dependencies=[Depends(require_admin)])
+def course_cache_stats():
+    return catalog_cache.stats()
 
 
 @router.get("/{course_id}")
-def get_course(course_id: int, db: Session = Depends(get_db)):
-    course = db.query(Course).filter(Course.course_id == course_id).first()
-    if not course:
+async def get_course(course_id: int, request: Request, db=Depends(get_async_db)):
+    cache_key = ("course", course_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return conditional_response(request, cached)
+    generation = catalog_cache.generation
+
+    # The row's xmin versions it, so a revalidation skips serializing
+    result = await db.execute(
+        select(*COURSE_PROJECTION.columns, literal_column("imc.courses.xmin::text"))
+        .where(Course.course_id == course_id)
+    )
+    row = result.first()
+    if not row:
         raise HTTPException(status_code=404, detail="Course not found")
-    
-    # Get actual chapter count
-    chapter_count = db.execute(text("""
-        SELECT COUNT(*) 
-        FROM imc.course_chapters 
-        WHERE course_id = :course_id
-    """), {"course_id": course_id}).scalar() or 0
-    
-    course_dict = CourseOut.model_validate(course).model_dump(by_alias=True)
-    course_dict['lessons'] = chapter_count
-    
-    return course_dict
+    etag = version_etag(row[-1], cache_key)
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    rendered = render(COURSE_PROJECTION.to_dict(row), etag)
+    catalog_cache.set(cache_key, rendered, generation=generation)
+    return conditional_response(request, rendered)
 
 
 @router.post("", status_code=status.HTTP_201_CREATED)
@@ -88,6 +192,8 @@ def create_course(payload: CourseCreate, db: Session = Depends(get_db)):
     )
     db.add(course)
     db.commit()
+    catalog_cache.clear()
+    invalidate_search_index()
     db.refresh(course)
     return CourseOut.model_validate(course).model_dump(by_alias=True)
 
@@ -103,6 +209,8 @@ def update_course(course_id: int, payload: CourseUpdate, db: Session = Depends(g
         setattr(course, k, v)
 
     db.commit()
+    catalog_cache.clear()
+    invalidate_search_index()
     db.refresh(course)
     return CourseOut.model_validate(course).model_dump(by_alias=True)
 
@@ -115,4 +223,6 @@ def delete_course(course_id: int, db: Session = Depends(get_db)):
 
     db.delete(course)
     db.commit()
+    catalog_cache.clear()
+    invalidate_search_index()
     return None
@@ -1,36 +1,183 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from app.db.session import get_db
+from app.core.security import current_parent_id, require_parent_of_child
+from app.core.serialization import ORJSONResponse
+from app.db.session import get_async_db
 
 router = APIRouter()
 
+# Children with enrollment count and average progress. Both aggregates are
+# computed once, grouped over just this parent's children, and joined back -
+# not re-run per child row as correlated subqueries.
+CHILDREN_SQL = text("""
+    WITH kids AS (
+        SELECT student_user_id AS user_id
+        FROM imc.parent_student
+        WHERE parent_user_id = :parent_id
+    ),
+    enrollment_counts AS (
+        SELECT e.user_id, COUNT(*) AS course_count
+        FROM imc.enrollments e
+        WHERE e.status = 'active'
+          AND e.user_id IN (SELECT user_id FROM kids)
+        GROUP BY e.user_id
+    ),
+    progress AS (
+        SELECT cp.user_id, ROUND(AVG(cp.progress_percent)::numeric, 2) AS avg_progress
+        FROM imc.course_progress cp
+        WHERE cp.user_id IN (SELECT user_id FROM kids)
+        GROUP BY cp.user_id
+    )
+    SELECT
+        u.user_id,
+        u.email,
+        u.first_name,
+        u.last_name,
+        COALESCE(ec.course_count, 0) AS course_count,
+        p.avg_progress
+    FROM kids k
+    JOIN imc.users u ON u.user_id = k.user_id
+    LEFT JOIN enrollment_counts ec ON ec.user_id = u.user_id
+    LEFT JOIN progress p ON p.user_id = u.user_id
+    ORDER BY u.first_name, u.last_name
+""")
+
+
+# Course and quiz stats for one child. Each table is aggregated on its own, so
+# enrollments x progress x quiz attempts are never joined into one product
+# that COUNT(DISTINCT)/AVG then have to shrink back down.
+SUMMARY_STATS_SQL = text("""
+    SELECT
+        (SELECT COUNT(DISTINCT e.course_id)
+         FROM imc.enrollments e
+         WHERE e.user_id = :child_id AND e.status = 'active') AS total_courses,
+        (SELECT ROUND(AVG(cp.progress_percent)::numeric, 2)
+         FROM imc.course_progress cp
+         WHERE cp.user_id = :child_id) AS avg_progress,
+        q.quizzes_passed,
+        q.total_quizzes
+    FROM (
+        SELECT
+            COUNT(*) FILTER (WHERE qat.score >= qat.max_score * 0.7) AS quizzes_passed,
+            COUNT(*) AS total_quizzes
+        FROM imc.quiz_attempts qat
+        WHERE qat.user_id = :child_id
+    ) q
+""")
+
+# Active courses with progress for a set of children (one child or a whole
+# family, so the single-child and overview endpoints share it).
+CHILD_COURSES_SQL = text("""
+    SELECT
+        e.user_id,
+        e.course_id,
+        c.course_name,
+        c.level,
+        c.description,
+        e.status,
+        e.enrollment_date,
+        COALESCE(cp.progress_percent, 0) as progress_percent
+    FROM imc.enrollments e
+    JOIN imc.courses c ON e.course_id = c.course_id
+    LEFT JOIN imc.course_progress cp ON cp.user_id = e.user_id AND cp.course_id = e.course_id
+    WHERE e.user_id = ANY(:child_ids) AND e.status = 'active'
+    ORDER BY e.user_id, c.course_id
+""")
+
+# Every child of a parent with the same stats as SUMMARY_STATS_SQL. Driving
+# from parent_student is the authorization check: only linked children come
+# back. Each stats table is grouped once for all children.
+OVERVIEW_CHILDREN_SQL = text("""
+    WITH kids AS (
+        SELECT student_user_id AS user_id
+        FROM imc.parent_student
+        WHERE parent_user_id = :parent_id
+    ),
+    enrollment_counts AS (
+        SELECT e.user_id, COUNT(DISTINCT e.course_id) AS total_courses
+        FROM imc.enrollments e
+        WHERE e.status = 'active'
+          AND e.user_id IN (SELECT user_id FROM kids)
+        GROUP BY e.user_id
+    ),
+    progress AS (
+        SELECT cp.user_id, ROUND(AVG(cp.progress_percent)::numeric, 2) AS avg_progress
+        FROM imc.course_progress cp
+        WHERE cp.user_id IN (SELECT user_id FROM kids)
+        GROUP BY cp.user_id
+    ),
+    quizzes AS (
+        SELECT
+            qat.user_id,
+            COUNT(*) FILTER (WHERE qat.score >= qat.max_score * 0.7) AS quizzes_passed,
+            COUNT(*) AS total_quizzes
+        FROM imc.quiz_attempts qat
+        WHERE qat.user_id IN (SELECT user_id FROM kids)
+        GROUP BY qat.user_id
+    )
+    SELECT
+        u.user_id,
+        u.first_name,
+        u.last_name,
+        u.email,
+        u.created_at,
+        ec.total_courses,
+        p.avg_progress,
+        q.quizzes_passed,
+        q.total_quizzes
+    FROM kids k
+    JOIN imc.users u ON u.user_id = k.user_id
+    LEFT JOIN enrollment_counts ec ON ec.user_id = u.user_id
+    LEFT JOIN progress p ON p.user_id = u.user_id
+    LEFT JOIN quizzes q ON q.user_id = u.user_id
+    ORDER BY u.first_name, u.last_name
+""")
+
+
+def _course_out(course) -> dict:
+    return {
+        "id": course["course_id"],
+        "title": course["course_name"],
+        "level": course["level"],
+        "description": course["description"],
+        "status": course["status"],
+        "enrolled_at": course["enrollment_date"],
+        "progress": float(course["progress_percent"] or 0),
+        "quiz": {
+            "correct": 0,
+            "total": 0,
+            "score": 0,
+            "status": "Not Started",
+        },
+    }
+
+
+def _summary_out(child, stats) -> dict:
+    return {
+        "id": child["user_id"],
+        "name": f"{child['first_name']} {child['last_name']}".strip(),
+        "email": child["email"],
+        "joined": child["created_at"],
+        "total_courses": stats["total_courses"] or 0,
+        "avg_progress": round(stats["avg_progress"] or 0, 2),
+        "quizzes_passed": stats["quizzes_passed"] or 0,
+        "total_quizzes": stats["total_quizzes"] or 0,
+    }
+
 
 @router.get("/children")
-def get_parent_children(parent_id: int, db: Session = Depends(get_db)):
+async def get_parent_children(
+    parent_id: int = Depends(current_parent_id),
+    db=Depends(get_async_db),
+):
     """
     Get all children of a parent
     Returns list of children with basic info and enrollment status
     """
-    children = db.execute(
-        text("""
-            SELECT 
-                u.user_id,
-                u.email,
-                u.first_name,
-                u.last_name,
-                (SELECT COUNT(*) FROM imc.enrollments e WHERE e.user_id = u.user_id AND e.status = 'active') as course_count,
-                (SELECT ROUND(AVG(cp.progress_percent)::numeric, 2) FROM imc.course_progress cp WHERE cp.user_id = u.user_id) as avg_progress
-            FROM imc.users u
-            JOIN imc.parent_student ps ON u.user_id = ps.student_user_id
-            WHERE ps.parent_user_id = :parent_id
-            ORDER BY u.first_name, u.last_name
-        """),
-        {"parent_id": parent_id},
-    ).mappings().all()
+    children = (await db.execute(CHILDREN_SQL, {"parent_id": parent_id})).mappings().all()
 
-    return [
+    return ORJSONResponse([
         {
             "id": child["user_id"],
             "name": f"{child['first_name']} {child['last_name']}".strip(),
@@ -39,126 +186,71 @@ def get_parent_children(parent_id: int, db: Session = Depends(get_db)):
             "avg_progress": child["avg_progress"] or 0,
         }
         for child in children
-    ]
+    ])
 
 
 @router.get("/children/{child_id}/courses")
-def get_child_courses(parent_id: int, child_id: int, db: Session = Depends(get_db)):
+async def get_child_courses(
+    child_id: int = Depends(require_parent_of_child),
+    db=Depends(get_async_db),
+):
     """
     Get all enrolled courses for a child
     Includes progress, quiz status, and performance metrics
     """
-    # Verify parent-child relationship
-    relation = db.execute(
-        text("""
-            SELECT 1 FROM imc.parent_student
-            WHERE parent_user_id = :parent_id AND student_user_id = :child_id
-            LIMIT 1
-        """),
-        {"parent_id": parent_id, "child_id": child_id},
-    ).scalar()
-
-    if not relation:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
-    courses = db.execute(
-        text("""
-            SELECT 
-                e.course_id,
-                c.course_name,
-                c.level,
-                c.description,
-                e.status,
-                e.enrollment_date,
-                COALESCE(cp.progress_percent, 0) as progress_percent
-            FROM imc.enrollments e
-            JOIN imc.courses c ON e.course_id = c.course_id
-            LEFT JOIN imc.course_progress cp ON cp.user_id = e.user_id AND cp.course_id = e.course_id
-            WHERE e.user_id = :child_id AND e.status = 'active'
-            ORDER BY c.course_id
-        """),
-        {"child_id": child_id},
-    ).mappings().all()
+    courses = (await db.execute(CHILD_COURSES_SQL, {"child_ids": [child_id]})).mappings().all()
 
-    result = []
-    for course in courses:
-        result.append(
-            {
-                "id": course["course_id"],
-                "title": course["course_name"],
-                "level": course["level"],
-                "description": course["description"],
-                "status": course["status"],
-                "enrolled_at": course["enrollment_date"],
-                "progress": float(course["progress_percent"] or 0),
-                "quiz": {
-                    "correct": 0,
-                    "total": 0,
-                    "score": 0,
-                    "status": "Not Started",
-                },
-            }
-        )
-
-    return result
+    return ORJSONResponse([_course_out(course) for course in courses])
 
 
 @router.get("/children/{child_id}/summary")
-def get_child_summary(parent_id: int, child_id: int, db: Session = Depends(get_db)):
+async def get_child_summary(
+    child_id: int = Depends(require_parent_of_child),
+    db=Depends(get_async_db),
+):
     """
     Get a summary of a child's performance
     Includes overall progress, assessments, and key metrics
     """
-    # Verify parent-child relationship
-    relation = db.execute(
-        text("""
-            SELECT 1 FROM imc.parent_student
-            WHERE parent_user_id = :parent_id AND student_user_id = :child_id
-            LIMIT 1
-        """),
-        {"parent_id": parent_id, "child_id": child_id},
-    ).scalar()
-
-    if not relation:
-        raise HTTPException(status_code=403, detail="Not authorized")
-
     # Get child info
-    child = db.execute(
+    child = (await db.execute(
         text("""
             SELECT user_id, first_name, last_name, email, created_at
             FROM imc.users
             WHERE user_id = :child_id
         """),
         {"child_id": child_id},
-    ).mappings().first()
+    )).mappings().first()
 
     if not child:
         raise HTTPException(status_code=404, detail="Child not found")
 
-    # Get course stats
-    stats = db.execute(
-        text("""
-            SELECT 
-                COUNT(DISTINCT e.course_id) as total_courses,
-                ROUND(AVG(cp.progress_percent)::numeric, 2) as avg_progress,
-                COUNT(DISTINCT CASE WHEN qat.score >= qat.max_score * 0.7 THEN qat.id END) as quizzes_passed,
-                COUNT(DISTINCT qat.id) as total_quizzes
-            FROM imc.users u
-            LEFT JOIN imc.enrollments e ON u.user_id = e.user_id AND e.status = 'active'
-            LEFT JOIN imc.course_progress cp ON u.user_id = cp.user_id
-            LEFT JOIN imc.quiz_attempts qat ON u.user_id = qat.user_id
-            WHERE u.user_id = :child_id
-        """),
-        {"child_id": child_id},
-    ).mappings().first()
+    stats = (await db.execute(SUMMARY_STATS_SQL, {"child_id": child_id})).mappings().first()
 
-    return {
-        "id": child["user_id"],
-        "name": f"{child['first_name']} {child['last_name']}".strip(),
-        "email": child["email"],
-        "joined": child["created_at"],
-        "total_courses": stats["total_courses"] or 0,
-        "avg_progress": round(stats["avg_progress"] or 0, 2),
-        "quizzes_passed": stats["quizzes_passed"] or 0,
-        "total_quizzes": stats["total_quizzes"] or 0,
-    }
+    return ORJSONResponse(_summary_out(child, stats))
+
+
+@router.get("/overview")
+async def get_parent_overview(
+    parent_id: int = Depends(current_parent_id),
+    db=Depends(get_async_db),
+):
+    """
+    Get every child of a parent with their summary and enrolled courses
+    Replaces /children plus per-child /courses and /summary calls; always two queries
+    """
+    children = (await db.execute(OVERVIEW_CHILDREN_SQL, {"parent_id": parent_id})).mappings().all()
+    if not children:
+        return ORJSONResponse([])
+
+    courses_by_child = {child["user_id"]: [] for child in children}
+    courses = (await db.execute(
+        CHILD_COURSES_SQL, {"child_ids": list(courses_by_child)}
+    )).mappings().all()
+    for course in courses:
+        courses_by_child[course["user_id"]].append(_course_out(course))
+
+    return ORJSONResponse([
+        {**_summary_out(child, child), "courses": courses_by_child[child["user_id"]]}
+        for child in children
+    ])
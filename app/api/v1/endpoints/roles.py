@@ -1,19 +1,32 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import text
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request
 
-from app.db.session import get_db
+from app.core.config import ROLES_CACHE_TTL
+from app.core.etag import conditional_response
+from app.core.security import require_admin
+from app.db.session import get_async_db
+from app.services.role_registry import role_registry
 
 router = APIRouter()
 
+
 @router.get("/roles")
-def list_roles(db: Session = Depends(get_db)):
-    rows = db.execute(
-        text("""
-            SELECT role_id, role_name
-            FROM imc.roles
-            ORDER BY role_id ASC
-        """)
-    ).mappings().all()
+async def list_roles(request: Request, db=Depends(get_async_db)):
+    # Served from the in-memory registry; db is only used when it needs a reload
+    snapshot = await role_registry.get(db)
+    return conditional_response(request, snapshot.rendered)
+
+
+@router.post("/roles/refresh", dependencies=[Depends(require_admin)])
+async def refresh_roles(db=Depends(get_async_db)):
+    """
+    Reload the role registry now, e.g. after editing imc.roles.
 
-    return [dict(r) for r in rows]
+    Only the instance that handles this request reloads; every other
+    instance picks up the change on its own within ROLES_CACHE_TTL seconds.
+    """
+    snapshot = await role_registry.refresh(db)
+    return {
+        "roles": len(snapshot.roles),
+        "scope": "instance",
+        "other_instances_reload_within_seconds": ROLES_CACHE_TTL,
+    }
@@ -1,19 +1,31 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
 from sqlalchemy import text
 
-from app.db.session import get_db
+from app.core.cache import TTLCache
+from app.core.config import STUDENT_DASHBOARD_CACHE_SIZE, STUDENT_DASHBOARD_CACHE_TTL
+from app.core.security import CurrentUser, current_student_id, get_current_user, resolve_user_id
+from app.core.serialization import ORJSONResponse
+from app.db.schema_registry import schema_registry
+from app.db.session import get_async_db
+from app.schemas.progress import ProgressEventAck, ProgressEventBatch
+from app.services.progress_buffer import ProgressBufferFull, progress_buffer
 
 router = APIRouter()
 
+# Per-student dashboard stats; progress writes pop the student's entry
+dashboard_cache = TTLCache(maxsize=STUDENT_DASHBOARD_CACHE_SIZE, ttl=STUDENT_DASHBOARD_CACHE_TTL)
+
 
 @router.get("/courses")
-def get_student_courses(student_id: int, db: Session = Depends(get_db)):
+async def get_student_courses(
+    student_id: int = Depends(current_student_id),
+    db=Depends(get_async_db),
+):
     """
     Get all enrolled courses for a student with progress
     Returns course details, progress percentage, and enrollment info
     """
-    courses = db.execute(
+    courses = (await db.execute(
         text("""
             SELECT 
                 c.course_id,
@@ -30,9 +42,9 @@ def get_student_courses(student_id: int, db: Session = Depends(get_db)):
             ORDER BY e.enrollment_date DESC
         """),
         {"student_id": student_id},
-    ).mappings().all()
+    )).mappings().all()
 
-    return [
+    return ORJSONResponse([
         {
             "id": course["course_id"],
             "title": course["title"],
@@ -45,78 +57,137 @@ def get_student_courses(student_id: int, db: Session = Depends(get_db)):
             "nextLesson": "Continue Learning"  # Placeholder - needs lesson table
         }
         for course in courses
-    ]
+    ])
+
+
+def invalidate_student_dashboard(student_id: int) -> None:
+    """Call after writing progress for a student."""
+    dashboard_cache.pop(student_id)
+
+
+def _on_progress_flush(student_ids: set[int]) -> None:
+    for student_id in student_ids:
+        invalidate_student_dashboard(student_id)
+
+
+progress_buffer.add_flush_listener(_on_progress_flush)
+
+
+@router.post("/progress/events", response_model=ProgressEventAck, status_code=202)
+async def post_progress_events(
+    payload: ProgressEventBatch,
+    user: CurrentUser = Depends(get_current_user),
+    db=Depends(get_async_db),
+):
+    """
+    Accept lesson heartbeats (viewed / progress / completed)
+    Events are buffered and written in batches; dashboards reflect them after the next flush
+    """
+    student_id = await resolve_user_id(db, user, payload.student_id)
+    # Events that cannot be written would only be buffered and dropped
+    if not await schema_registry.feature_ready(db, "progress"):
+        raise HTTPException(status_code=503, detail="Progress tracking is not available yet")
+    try:
+        accepted = progress_buffer.add(student_id, payload.events)
+    except ProgressBufferFull:
+        raise HTTPException(status_code=503, detail="Progress buffer is full, retry shortly")
+    return {"accepted": accepted}
+
+
+# Stands in for imc.student_activity_stats before its migration has run
+NO_ACTIVITY_STATS = """(
+    SELECT NULL::bigint AS user_id, 0 AS completed_lessons, NULL::date AS last_active_date,
+           0 AS current_streak, NULL::date AS week_start, 0 AS week_lessons_completed
+    WHERE false
+)"""
 
 
 @router.get("/dashboard")
-def get_student_dashboard(student_id: int, db: Session = Depends(get_db)):
+async def get_student_dashboard(
+    student_id: int = Depends(current_student_id),
+    db=Depends(get_async_db),
+):
     """
     Get student dashboard overview with statistics
     Returns enrolled courses count, progress stats, and goals
     """
-    # Get enrollment count
-    enrollment_count = db.execute(
-        text("""
-            SELECT COUNT(*) as count
-            FROM imc.enrollments
-            WHERE user_id = :student_id AND status = 'active'
-        """),
-        {"student_id": student_id},
-    ).scalar()
+    cached = dashboard_cache.get(student_id) if STUDENT_DASHBOARD_CACHE_TTL > 0 else None
+    if cached is not None:
+        return ORJSONResponse(cached)
 
-    # Get average progress
-    avg_progress = db.execute(
-        text("""
-            SELECT COALESCE(ROUND(AVG(progress_percent)::numeric, 2), 0) as avg
-            FROM imc.course_progress
-            WHERE user_id = :student_id
+    # One round trip: enrollment count, a single pass over course_progress and
+    # the precomputed activity rollup row (O(1) regardless of history length).
+    # Until the rollup tables are migrated the activity figures read as 0.
+    activity = (
+        "imc.student_activity_stats"
+        if await schema_registry.feature_ready(db, "progress")
+        else NO_ACTIVITY_STATS
+    )
+    stats = (await db.execute(
+        text(f"""
+            SELECT
+                (
+                    SELECT COUNT(*)
+                    FROM imc.enrollments
+                    WHERE user_id = :student_id AND status = 'active'
+                ) AS enrollment_count,
+                cp.avg_progress,
+                cp.completed_count,
+                cp.in_progress_count,
+                COALESCE(s.completed_lessons, 0) AS completed_lessons,
+                CASE
+                    WHEN s.last_active_date >= (now() AT TIME ZONE 'UTC')::date - 1
+                    THEN s.current_streak ELSE 0
+                END AS current_streak,
+                CASE
+                    WHEN s.week_start = date_trunc('week', now() AT TIME ZONE 'UTC')::date
+                    THEN s.week_lessons_completed ELSE 0
+                END AS weekly_progress
+            FROM (
+                SELECT
+                    COALESCE(ROUND(AVG(progress_percent)::numeric, 2), 0) AS avg_progress,
+                    COUNT(*) FILTER (WHERE progress_percent = 100) AS completed_count,
+                    COUNT(*) FILTER (
+                        WHERE progress_percent > 0 AND progress_percent < 100
+                    ) AS in_progress_count
+                FROM imc.course_progress
+                WHERE user_id = :student_id
+            ) cp
+            LEFT JOIN {activity} s ON s.user_id = :student_id
         """),
         {"student_id": student_id},
-    ).scalar()
+    )).mappings().first()
 
-    # Get completed courses count
-    completed_count = db.execute(
-        text("""
-            SELECT COUNT(*) as count
-            FROM imc.course_progress
-            WHERE user_id = :student_id AND progress_percent = 100
-        """),
-        {"student_id": student_id},
-    ).scalar()
-
-    # Get in-progress courses count
-    in_progress_count = db.execute(
-        text("""
-            SELECT COUNT(*) as count
-            FROM imc.course_progress
-            WHERE user_id = :student_id AND progress_percent > 0 AND progress_percent < 100
-        """),
-        {"student_id": student_id},
-    ).scalar()
-
-    return {
-        "enrolledCourses": enrollment_count or 0,
-        "completedLessons": 0,  # Placeholder - needs lesson_progress table
+    dashboard = {
+        "enrolledCourses": stats["enrollment_count"] or 0,
+        "completedLessons": stats["completed_lessons"] or 0,
         "totalLessons": 0,  # Placeholder - needs lessons table
-        "averageProgress": float(avg_progress or 0),
-        "completedCourses": completed_count or 0,
-        "inProgressCourses": in_progress_count or 0,
+        "averageProgress": float(stats["avg_progress"] or 0),
+        "completedCourses": stats["completed_count"] or 0,
+        "inProgressCourses": stats["in_progress_count"] or 0,
         "upcomingQuiz": None,  # Placeholder - needs quiz scheduling
         "weeklyGoal": 5,  # Hardcoded for now
-        "weeklyProgress": 0,  # Placeholder - needs activity tracking
-        "currentStreak": 0,  # Placeholder - needs activity tracking
+        "weeklyProgress": stats["weekly_progress"] or 0,
+        "currentStreak": stats["current_streak"] or 0,
     }
 
+    if STUDENT_DASHBOARD_CACHE_TTL > 0:
+        dashboard_cache.set(student_id, dashboard)
+    return ORJSONResponse(dashboard)
+
 
 @router.get("/lessons/upcoming")
-def get_upcoming_lessons(student_id: int, db: Session = Depends(get_db)):
+async def get_upcoming_lessons(
+    student_id: int = Depends(current_student_id),
+    db=Depends(get_async_db),
+):
     """
     Get upcoming lessons for the student
     Returns lessons from enrolled courses with due dates
     """
     # For now, return enrolled courses as placeholder
     # This needs the lessons table to be fully functional
-    courses = db.execute(
+    courses = (await db.execute(
         text("""
             SELECT 
                 c.course_id,
@@ -129,9 +200,9 @@ def get_upcoming_lessons(student_id: int, db: Session = Depends(get_db)):
             LIMIT 5
         """),
         {"student_id": student_id},
-    ).mappings().all()
+    )).mappings().all()
 
-    return [
+    return ORJSONResponse([
         {
             "id": idx + 1,
             "course": course["course_name"],
@@ -140,4 +211,4 @@ def get_upcoming_lessons(student_id: int, db: Session = Depends(get_db)):
             "duration": "20 min",
         }
         for idx, course in enumerate(courses)
-    ]
+    ])
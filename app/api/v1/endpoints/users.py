@@ -1,7 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import func, select
 
+from app.auth import normalize_email
 from app.db.session import get_db
 from app.db.models import User
 from app.schemas.user import UserOut
@@ -17,7 +18,7 @@ def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
 
 @router.get("", response_model=UserOut)
 def get_user_by_email(email: str, db: Session = Depends(get_db)):
-    stmt = select(User).where(User.email == email)
+    stmt = select(User).where(func.lower(User.email) == normalize_email(email))
     user = db.execute(stmt).scalar_one_or_none()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.v1.endpoints import auth, users, roles, courses, parent, student
+from app.api.v1.endpoints import admin, admin_course_submit, assets, auth, users, roles, courses, parent, student
 
 api_router = APIRouter()
 
@@ -8,4 +8,7 @@ api_router.include_router(courses.router, prefix="/courses", tags=["Courses"])
 api_router.include_router(auth.router, prefix="/auth", tags=["Auth"])
 api_router.include_router(parent.router, prefix="/parent", tags=["Parent"])
 api_router.include_router(student.router, prefix="/student", tags=["Student"])
-api_router.include_router(roles.router, tags=["Roles"])
\ No newline at end of file
+api_router.include_router(roles.router, tags=["Roles"])
+api_router.include_router(admin.router, prefix="/admin", tags=["Admin"])
+api_router.include_router(admin_course_submit.router)
+api_router.include_router(assets.router, tags=["Assets"])
@@ -1,4 +1,6 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Dict, Any
 
@@ -6,14 +8,29 @@ from jose import jwt
 from passlib.context import CryptContext
 import bcrypt
 
+from app.core.config import KDF_QUEUE_MAX, KDF_WORKERS, PBKDF2_ROUNDS
+
 # Support both bcrypt and pbkdf2 to verify existing/demo users
-# Prefer pbkdf2 by default to avoid local bcrypt backend issues
-pwd_context = CryptContext(schemes=["pbkdf2_sha256", "bcrypt"], deprecated="auto")
+# Prefer pbkdf2 by default to avoid local bcrypt backend issues.
+# min = max = default rounds, so any pbkdf2 hash not at PBKDF2_ROUNDS (and any
+# bcrypt hash) is reported by needs_update and rehashed at the next login.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256", "bcrypt"],
+    deprecated=["bcrypt"],
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__max_rounds=PBKDF2_ROUNDS,
+)
 
 JWT_SECRET = os.getenv("JWT_SECRET", "change-me-in-secret-manager")
 JWT_ALG = os.getenv("JWT_ALG", "HS256")
 JWT_EXPIRE_MIN = int(os.getenv("JWT_EXPIRE_MIN", "120"))
 
+def normalize_email(email: str) -> str:
+    # Emails are matched case-insensitively everywhere: compare lower(email)
+    # (backed by the unique index on lower(email)) with this value
+    return email.strip().lower()
+
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
@@ -33,6 +50,84 @@ def verify_password(plain_password: str, password_hash: str) -> bool:
                 return False
         return False
 
+def verify_and_update_password(plain_password: str, password_hash: str) -> tuple[bool, Optional[str]]:
+    """
+    Verify and, if the stored hash is outdated, return a replacement hash.
+
+    Returns (valid, new_hash); new_hash is None when the stored hash is
+    already current or the password is wrong.
+    """
+    try:
+        return pwd_context.verify_and_update(plain_password, password_hash)
+    except Exception:
+        # Same bcrypt fallback as verify_password; a match is always upgraded
+        if verify_password(plain_password, password_hash):
+            return True, hash_password(plain_password)
+        return False, None
+
+
+class KDFPoolBusy(Exception):
+    """Raised when the password-hashing queue is full; map to 503."""
+
+
+class KDFPool:
+    """
+    Dedicated, bounded executor for password hashing and verification.
+
+    pbkdf2 (hashlib) and bcrypt release the GIL while hashing, so plain
+    threads run them in parallel without starving Starlette's threadpool or
+    the event loop. At most `workers` hashes run at once; up to `max_queue`
+    more may wait, and anything beyond that is rejected immediately instead
+    of piling up behind a login burst.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="kdf")
+
+    async def run(self, fn, *args):
+        # Only touched from the event loop, so the counter needs no lock
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise KDFPoolBusy()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "pending": self.pending,
+            "rejected": self.rejected,
+        }
+
+
+kdf_pool = KDFPool(KDF_WORKERS, KDF_QUEUE_MAX)
+
+
+async def hash_password_async(password: str) -> str:
+    return await kdf_pool.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, password_hash: str) -> bool:
+    return await kdf_pool.run(verify_password, plain_password, password_hash)
+
+
+async def verify_and_update_password_async(
+    plain_password: str, password_hash: str
+) -> tuple[bool, Optional[str]]:
+    return await kdf_pool.run(verify_and_update_password, plain_password, password_hash)
+
+
 def create_access_token(subject: str, extra: Optional[Dict[str, Any]] = None) -> str:
     now = datetime.now(timezone.utc)
     exp = now + timedelta(minutes=JWT_EXPIRE_MIN)
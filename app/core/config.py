@@ -26,3 +26,121 @@ def get_database_url() -> str:
 
     # No DB configured
     return ""
+
+# In-process course catalog cache (GET /courses, GET /courses/{id})
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "512"))
+
+# Course search backend: "auto" uses Postgres FTS/trigram when the index and
+# pg_trgm are present, otherwise the in-memory inverted index.
+COURSE_SEARCH_BACKEND = os.getenv("COURSE_SEARCH_BACKEND", "auto").lower()
+# With "auto", how long a fallback to memory stands before the check is rerun
+# (e.g. once the search index migration has been applied)
+COURSE_SEARCH_DETECT_RETRY = float(os.getenv("COURSE_SEARCH_DETECT_RETRY", "300"))
+
+# In-memory role registry (GET /roles and auth role lookups) reload interval
+ROLES_CACHE_TTL = float(os.getenv("ROLES_CACHE_TTL", "300"))
+
+# Per-student GET /student/dashboard cache; set the TTL to 0 to disable
+STUDENT_DASHBOARD_CACHE_TTL = float(os.getenv("STUDENT_DASHBOARD_CACHE_TTL", "30"))
+STUDENT_DASHBOARD_CACHE_SIZE = int(os.getenv("STUDENT_DASHBOARD_CACHE_SIZE", "10000"))
+
+# Async read path (SQLAlchemy asyncio + asyncpg). When off, async endpoints
+# run their queries on the sync pg8000 engine through the threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in {"1", "true", "yes"}
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
+
+def get_async_database_url() -> str:
+    url = get_database_url()
+    if not url:
+        return ""
+
+    from sqlalchemy.engine import make_url
+
+    parsed = make_url(url)
+    query = dict(parsed.query)
+    # pg8000 takes the full socket path; asyncpg takes the socket directory as host
+    unix_sock = query.pop("unix_sock", None)
+    if unix_sock:
+        query["host"] = unix_sock.rsplit("/", 1)[0]
+    return parsed.set(drivername="postgresql+asyncpg", query=query).render_as_string(
+        hide_password=False
+    )
+
+# Progress-event ingestion: buffered in memory, flushed as multi-row UPSERTs
+# when PROGRESS_FLUSH_SIZE lesson updates are pending or every
+# PROGRESS_FLUSH_INTERVAL seconds, whichever comes first.
+PROGRESS_FLUSH_SIZE = int(os.getenv("PROGRESS_FLUSH_SIZE", "500"))
+PROGRESS_FLUSH_INTERVAL = float(os.getenv("PROGRESS_FLUSH_INTERVAL", "2"))
+PROGRESS_BUFFER_MAX = int(os.getenv("PROGRESS_BUFFER_MAX", "50000"))
+
+# Parent -> children sets used to authorize child-scoped parent endpoints.
+# The TTL bounds how long a removed parent_student link still grants access.
+PARENT_AUTH_CACHE_TTL = float(os.getenv("PARENT_AUTH_CACHE_TTL", "60"))
+PARENT_AUTH_CACHE_SIZE = int(os.getenv("PARENT_AUTH_CACHE_SIZE", "10000"))
+
+# Password hashing runs on its own bounded pool instead of Starlette's shared
+# threadpool. Hash/verify calls beyond KDF_WORKERS wait in a queue; once
+# KDF_QUEUE_MAX are waiting, new ones are refused with 503 + Retry-After.
+KDF_WORKERS = int(os.getenv("KDF_WORKERS", str(os.cpu_count() or 2)))
+KDF_QUEUE_MAX = int(os.getenv("KDF_QUEUE_MAX", "64"))
+KDF_RETRY_AFTER = int(os.getenv("KDF_RETRY_AFTER", "2"))
+
+# pbkdf2_sha256 iteration count for new hashes; existing hashes at any other
+# count are rehashed on the next successful login. Pick it for the target
+# hardware with scripts/calibrate_kdf.py (29000 is passlib's default).
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "29000"))
+
+# Decoded bearer-token claims, keyed by token hash and kept until the token's exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "50000"))
+# Admin claims are confirmed against imc.user_roles; a revoked admin keeps
+# access for at most ADMIN_ROLE_CACHE_TTL seconds
+ADMIN_ROLE_CACHE_TTL = float(os.getenv("ADMIN_ROLE_CACHE_TTL", "60"))
+ADMIN_ROLE_CACHE_SIZE = int(os.getenv("ADMIN_ROLE_CACHE_SIZE", "1000"))
+
+# Startup check for the tables the app needs (app/db/schema_registry.py):
+# strict = refuse to start if one is missing, warn = log it, off = skip.
+# Only the base tables count; a feature whose migration has not run yet
+# (FEATURE_TABLES) is logged and its endpoints answer 503 until it has.
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "strict").lower()
+
+# Object storage for uploaded course assets (app/services/storage.py):
+# "gcs" needs GCS_BUCKET; "local" writes under STORAGE_LOCAL_ROOT for offline
+# development and tests. Defaults to gcs when a bucket is configured.
+GCS_BUCKET = os.getenv("GCS_BUCKET", "")
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "gcs" if GCS_BUCKET else "local").lower()
+STORAGE_LOCAL_ROOT = os.getenv("STORAGE_LOCAL_ROOT", "./media")
+STORAGE_LOCAL_BASE_URL = os.getenv("STORAGE_LOCAL_BASE_URL", "/api/v1/media")
+# Uploads stream through a bounded pool: at most STORAGE_UPLOAD_WORKERS objects
+# upload at once, each buffering at most STORAGE_PIPE_DEPTH request chunks
+STORAGE_UPLOAD_WORKERS = int(os.getenv("STORAGE_UPLOAD_WORKERS", "4"))
+STORAGE_PIPE_DEPTH = int(os.getenv("STORAGE_PIPE_DEPTH", "16"))
+# GCS resumable upload chunk; must be a multiple of 256 KiB
+GCS_UPLOAD_CHUNK_SIZE = int(os.getenv("GCS_UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+# Job-mode course submissions (app/services/course_ingest.py): files are
+# staged on local disk under INGEST_STAGING_ROOT, then INGEST_WORKERS threads
+# copy them to storage. Over INGEST_QUEUE_MAX waiting jobs, or
+# INGEST_STAGING_MAX_BYTES of staged files, submits get 503.
+# Finished jobs stay pollable for INGEST_JOB_RETENTION seconds.
+# On Cloud Run /tmp is in-memory, so staged bytes count against the instance's
+# memory limit, and the workers need CPU after the response is sent: deploy
+# with --no-cpu-throttling (see .github/workflows/deploy-cloudrun-branch.yml).
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", "32"))
+INGEST_JOB_RETENTION = int(os.getenv("INGEST_JOB_RETENTION", "3600"))
+INGEST_STAGING_ROOT = os.getenv("INGEST_STAGING_ROOT", "/tmp/imc-ingest")
+INGEST_STAGING_MAX_BYTES = int(os.getenv("INGEST_STAGING_MAX_BYTES", str(256 * 1024 * 1024)))
+# Staged files older than this are leftovers of a killed process; swept at startup
+INGEST_STAGING_MAX_AGE = int(os.getenv("INGEST_STAGING_MAX_AGE", "86400"))
+
+# Course asset delivery (GET /assets/{asset_id}): playback URLs are signed for
+# ASSET_URL_TTL seconds (GCS V4 signed URLs, or HMAC-signed /media URLs for
+# local storage) and cached per (object, user) until ASSET_URL_MIN_REMAINING
+# seconds are left, so one signature serves many requests.
+ASSET_URL_TTL = int(os.getenv("ASSET_URL_TTL", "900"))
+ASSET_URL_MIN_REMAINING = int(os.getenv("ASSET_URL_MIN_REMAINING", "120"))
+ASSET_URL_CACHE_SIZE = int(os.getenv("ASSET_URL_CACHE_SIZE", "20000"))
+MEDIA_URL_SECRET = os.getenv("MEDIA_URL_SECRET") or os.getenv("JWT_SECRET", "change-me-in-secret-manager")
@@ -0,0 +1,69 @@
+"""
+Conditional GET helpers for read-mostly endpoints.
+
+Payloads are rendered once and cached together with their ETag, so a
+matching If-None-Match is answered with 304 straight from the cache without
+touching the database or re-serializing.
+
+The tag is either a hash of the body (`make_etag`) or, where the data has a
+cheap version (a row count plus transaction ids, say), a hash of that version
+and the request's cache key (`version_etag`). A version tag can be checked
+with `not_modified` before the payload is queried and built, so a revalidation
+that misses the cache still skips the expensive part. Either way every
+instance computes the same tag for the same data.
+"""
+import hashlib
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from app.core.serialization import dumps
+
+CACHE_CONTROL = "no-cache"
+
+
+class RenderedJSON:
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def version_etag(version: Any, key: Any) -> str:
+    """Tag for the payload behind `key` while the data is at `version`."""
+    return '"' + hashlib.blake2b(repr((version, key)).encode(), digest_size=16).hexdigest() + '"'
+
+
+def render(content: Any, etag: Optional[str] = None) -> RenderedJSON:
+    body = dumps(content)
+    return RenderedJSON(body, etag or make_etag(body))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses weak comparison
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 if the client already holds `etag`, else None."""
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+    return None
+
+
+def conditional_response(request: Request, rendered: RenderedJSON) -> Response:
+    response = not_modified(request, rendered.etag)
+    if response is not None:
+        return response
+    headers = {"ETag": rendered.etag, "Cache-Control": CACHE_CONTROL}
+    return Response(content=rendered.body, media_type="application/json", headers=headers)
@@ -0,0 +1,195 @@
+"""
+Authentication and authorization helpers shared by endpoints.
+
+`get_current_user` verifies the bearer token issued by /auth/login. Decoded
+claims are cached by token hash until the token's exp, so a client polling
+with the same token pays for the HMAC check and JSON parse once.
+`current_student_id` / `current_parent_id` resolve the optional
+student_id / parent_id query parameters against that identity.
+
+Admin rights are never taken from the token alone: a token whose role claim
+is admin is confirmed against imc.user_roles (`has_admin_role`, cached for
+ADMIN_ROLE_CACHE_TTL seconds), so a forged or outdated claim grants nothing.
+
+Parent endpoints that act on one child check the parent_student link first.
+Instead of a round trip per request, each parent's full child set is loaded
+once and kept in a bounded TTL cache; `require_parent_of_child` is the
+FastAPI dependency that uses it. Links are made and removed outside this
+process, so a new link is picked up at once (a miss reloads the set) but a
+removed one keeps authorizing for up to PARENT_AUTH_CACHE_TTL seconds.
+"""
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError, jwt
+from sqlalchemy import text
+
+from app.auth import JWT_ALG, JWT_SECRET
+from app.core.cache import TTLCache
+from app.core.config import (
+    ADMIN_ROLE_CACHE_SIZE,
+    ADMIN_ROLE_CACHE_TTL,
+    PARENT_AUTH_CACHE_SIZE,
+    PARENT_AUTH_CACHE_TTL,
+    TOKEN_CACHE_SIZE,
+)
+from app.db.session import get_async_db
+
+ADMIN_ROLE = "admin"
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+# sha256(token) -> CurrentUser; each entry's ttl is the token's remaining lifetime
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=0)
+
+# user_id -> whether imc.user_roles grants the admin role
+admin_role_cache = TTLCache(maxsize=ADMIN_ROLE_CACHE_SIZE, ttl=ADMIN_ROLE_CACHE_TTL)
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    user_id: int
+    role: str
+    email: Optional[str]
+    expires_at: int
+
+    @property
+    def claims_admin(self) -> bool:
+        """The token says admin; confirm with `has_admin_role` before trusting it."""
+        return self.role == ADMIN_ROLE
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def decode_access_token(token: str) -> CurrentUser:
+    """Verify a token (signature + exp) and return its identity; cached until exp."""
+    key = hashlib.sha256(token.encode("utf-8")).digest()
+    user = token_cache.get(key)
+    if user is not None:
+        return user
+
+    try:
+        claims = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALG])
+        user = CurrentUser(
+            user_id=int(claims["sub"]),
+            role=claims.get("role") or "student",
+            email=claims.get("email"),
+            expires_at=int(claims["exp"]),
+        )
+    except (JWTError, KeyError, TypeError, ValueError):
+        raise _unauthorized("Invalid or expired token")
+
+    remaining = user.expires_at - time.time()
+    if remaining > 0:
+        token_cache.set(key, user, ttl=remaining)
+    return user
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> CurrentUser:
+    """Dependency: the authenticated user, or 401."""
+    if credentials is None:
+        raise _unauthorized("Not authenticated")
+    return decode_access_token(credentials.credentials)
+
+
+async def has_admin_role(db, user: CurrentUser) -> bool:
+    """True if the token claims admin and imc.user_roles agrees."""
+    if not user.claims_admin:
+        return False
+    granted = admin_role_cache.get(user.user_id)
+    if granted is None:
+        granted = bool((await db.execute(
+            text("""
+                SELECT EXISTS (
+                    SELECT 1
+                    FROM imc.user_roles ur
+                    JOIN imc.roles r ON r.role_id = ur.role_id
+                    WHERE ur.user_id = :user_id AND lower(r.role_name) = :role
+                )
+            """),
+            {"user_id": user.user_id, "role": ADMIN_ROLE},
+        )).scalar())
+        admin_role_cache.set(user.user_id, granted)
+    return granted
+
+
+async def require_admin(user: CurrentUser = Depends(get_current_user), db=Depends(get_async_db)) -> CurrentUser:
+    """Dependency: the authenticated user if they are an admin, else 403."""
+    try:
+        granted = await has_admin_role(db, user)
+    finally:
+        # Admin endpoints may stream a long request body next; don't hold
+        # this read's transaction open meanwhile
+        await db.rollback()
+    if not granted:
+        raise HTTPException(status_code=403, detail="Admin only")
+    return user
+
+
+async def resolve_user_id(db, user: CurrentUser, requested: Optional[int]) -> int:
+    """The caller's own id unless an admin asks for someone else's."""
+    if requested is None or requested == user.user_id:
+        return user.user_id
+    if await has_admin_role(db, user):
+        return requested
+    raise HTTPException(status_code=403, detail="Not authorized")
+
+
+async def current_student_id(
+    student_id: Optional[int] = None,
+    user: CurrentUser = Depends(get_current_user),
+    db=Depends(get_async_db),
+) -> int:
+    return await resolve_user_id(db, user, student_id)
+
+
+async def current_parent_id(
+    parent_id: Optional[int] = None,
+    user: CurrentUser = Depends(get_current_user),
+    db=Depends(get_async_db),
+) -> int:
+    return await resolve_user_id(db, user, parent_id)
+
+# parent_user_id -> frozenset of student_user_ids
+parent_children_cache = TTLCache(maxsize=PARENT_AUTH_CACHE_SIZE, ttl=PARENT_AUTH_CACHE_TTL)
+
+
+async def _load_children(db, parent_id: int) -> frozenset:
+    generation = parent_children_cache.generation
+    rows = (await db.execute(
+        text("""
+            SELECT student_user_id FROM imc.parent_student
+            WHERE parent_user_id = :parent_id
+        """),
+        {"parent_id": parent_id},
+    )).scalars().all()
+    children = frozenset(rows)
+    parent_children_cache.set(parent_id, children, generation=generation)
+    return children
+
+
+async def require_parent_of_child(
+    child_id: int,
+    parent_id: int = Depends(current_parent_id),
+    db=Depends(get_async_db),
+) -> int:
+    """
+    Dependency: 403 unless `child_id` is linked to `parent_id`, else returns child_id.
+
+    A cached set that lacks the child is reloaded once before refusing, so a
+    link made since the entry was cached is honoured straight away.
+    """
+    children = parent_children_cache.get(parent_id)
+    if children is None or child_id not in children:
+        children = await _load_children(db, parent_id)
+    if child_id not in children:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return child_id
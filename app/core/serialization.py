@@ -0,0 +1,75 @@
+"""
+Fast row -> JSON path for list endpoints.
+
+`RowProjection` turns a Pydantic output schema into a fixed list of ORM columns
+and their serialized names once at import time, so list endpoints can select
+plain tuples and zip them into dicts instead of validating and dumping a
+model per row. `ORJSONResponse` renders the result with orjson.
+
+Return `ORJSONResponse(...)` instances directly from the handler: FastAPI
+skips jsonable_encoder only when it is handed a Response.
+"""
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class RowProjection:
+    """
+    Precompiled column list + alias mapping for a schema/model pair.
+
+    For every schema field the ORM attribute comes from `validation_alias`
+    (falling back to the field name) and the output key from
+    `serialization_alias`, matching `Schema.model_validate(obj).model_dump(by_alias=True)`.
+    Numeric (Decimal) columns are converted to float like the schema does.
+    """
+
+    def __init__(self, schema, model):
+        columns = []
+        keys = []
+        float_positions = []
+        for name, field in schema.model_fields.items():
+            source = field.validation_alias if isinstance(field.validation_alias, str) else name
+            column = getattr(model, source)
+            if getattr(column.type, "asdecimal", False):
+                float_positions.append(len(columns))
+            columns.append(column)
+            keys.append(field.serialization_alias or name)
+
+        self.columns = tuple(columns)
+        self.keys = tuple(keys)
+        self._float_positions = tuple(float_positions)
+
+    def index(self, key: str) -> int:
+        return self.keys.index(key)
+
+    def to_dict(self, row: Sequence[Any]) -> dict:
+        if self._float_positions:
+            row = list(row)
+            for i in self._float_positions:
+                if row[i] is not None:
+                    row[i] = float(row[i])
+        return dict(zip(self.keys, row))
+
+    def to_dicts(self, rows: Iterable[Sequence[Any]]) -> list[dict]:
+        to_dict = self.to_dict
+        return [to_dict(row) for row in rows]
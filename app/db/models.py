@@ -1,6 +1,6 @@
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy import String, Integer, DateTime, Numeric
-from sqlalchemy import func
+from sqlalchemy import Index, func
 
 class Base(DeclarativeBase):
     pass
@@ -15,6 +15,10 @@ class User(Base):
     last_name: Mapped[str | None] = mapped_column(String(100), nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
 
+# Case-insensitive uniqueness + the index behind every lower(email) = :email
+# lookup (created on existing databases by scripts/add_email_lower_index.py)
+Index("users_email_lower_key", func.lower(User.email), unique=True)
+
 # --- Course model ---
 from sqlalchemy import Boolean, BigInteger, Text
 
@@ -39,5 +43,46 @@ class Course(Base):
 
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, server_default="true")
 
+    # Denormalized COUNT(*) of imc.course_chapters, kept current by the
+    # course_chapters trigger (scripts/add_chapter_count.py)
+    chapter_count: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
+
+# --- Course asset model ---
+from sqlalchemy import ForeignKey
+
+
+class CourseAsset(Base):
+    """A video or PDF attached to a course: an uploaded object or a YouTube link."""
+
+    __tablename__ = "course_assets"
+    __table_args__ = {"schema": "imc"}
+
+    asset_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    course_id: Mapped[int] = mapped_column(
+        Integer, ForeignKey("imc.courses.course_id", ondelete="CASCADE"), nullable=False, index=True
+    )
+
+    asset_kind: Mapped[str] = mapped_column(String(20), nullable=False)   # video / pdf
+    source_type: Mapped[str] = mapped_column(String(20), nullable=False)  # upload / youtube
+    title: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    sort_order: Mapped[int] = mapped_column(Integer, nullable=False, server_default="0")
+
+    # source_type = youtube
+    url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    youtube_id: Mapped[str | None] = mapped_column(String(20), nullable=True)
+
+    # source_type = upload (gcs_bucket is "local" for the filesystem backend)
+    gcs_bucket: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    gcs_object: Mapped[str | None] = mapped_column(Text, nullable=True)
+    file_url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    mime_type: Mapped[str | None] = mapped_column(String(255), nullable=True)
+    size_bytes: Mapped[int | None] = mapped_column(BigInteger, nullable=True)
+    # Hex sha256 of the file; uploads are stored once per hash (gcs_object is
+    # shared by every asset with the same content)
+    content_sha256: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+
+    created_by: Mapped[int | None] = mapped_column(Integer, nullable=True)
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
-    
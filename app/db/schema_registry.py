@@ -0,0 +1,188 @@
+"""
+Cached metadata about the imc tables the app depends on.
+
+The tables and their columns are read once at startup from pg_catalog
+(information_schema views are slow catalog joins) and kept in memory.
+Endpoints that adapt to optional columns ask `schema_registry.has_column`
+instead of querying the catalog per request. The snapshot is reloaded on
+SIGHUP or through POST /admin/schema/refresh, e.g. after a migration.
+
+`check_required` is the startup check: with SCHEMA_CHECK=strict the app
+refuses to start when a required table is missing, rather than failing later
+on the first request that touches it. Tables added by later migrations belong
+to a feature instead (FEATURE_TABLES): a deploy that ships before the
+migration still boots, and the feature's endpoints ask `feature_ready` and
+answer 503 (or leave the data out) until it has run and the schema is
+refreshed.
+"""
+import asyncio
+import logging
+import signal
+import time
+from typing import Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.db.session import ThreadedSession
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "imc"
+
+# Endpoints cannot work without these
+REQUIRED_TABLES = (
+    "users",
+    "roles",
+    "user_roles",
+    "courses",
+    "course_chapters",
+    "enrollments",
+    "course_progress",
+    "parent_student",
+)
+
+# Tables each feature needs, created by its migration script. Checked lazily
+# by the feature's endpoints, never at startup.
+FEATURE_TABLES = {
+    # Progress events and the activity rollup (app/services/progress_buffer.py,
+    # scripts/add_activity_rollup_tables.py)
+    "progress": ("lesson_progress", "student_daily_activity", "student_activity_stats"),
+    # Uploaded course files (scripts/add_course_assets_table.py)
+    "assets": ("course_assets",),
+}
+
+# Introspected too, but features degrade instead of the app refusing to start
+OPTIONAL_TABLES = ("quiz_attempts",) + tuple(
+    table for tables in FEATURE_TABLES.values() for table in tables
+)
+
+
+class SchemaError(RuntimeError):
+    """Required tables are missing from the database."""
+
+
+class SchemaSnapshot:
+    def __init__(self, rows):
+        columns: dict[str, set[str]] = {}
+        for row in rows:
+            bucket = columns.setdefault(row["table_name"], set())
+            if row["column_name"]:
+                bucket.add(row["column_name"])
+        self.tables: dict[str, frozenset] = {name: frozenset(cols) for name, cols in columns.items()}
+        self.loaded_at = time.time()
+
+    def has_table(self, table: str) -> bool:
+        return table in self.tables
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in self.tables.get(table, ())
+
+    def columns(self, table: str) -> frozenset:
+        return self.tables.get(table, frozenset())
+
+    def missing_tables(self) -> list[str]:
+        return [table for table in REQUIRED_TABLES if table not in self.tables]
+
+    def missing_feature_tables(self, feature: str) -> list[str]:
+        return [table for table in FEATURE_TABLES[feature] if table not in self.tables]
+
+    def to_dict(self) -> dict:
+        return {
+            "schema": SCHEMA,
+            "loaded_at": self.loaded_at,
+            "missing_required": self.missing_tables(),
+            "missing_features": {
+                feature: missing
+                for feature in FEATURE_TABLES
+                if (missing := self.missing_feature_tables(feature))
+            },
+            "tables": {name: sorted(cols) for name, cols in sorted(self.tables.items())},
+        }
+
+
+class SchemaRegistry:
+    def __init__(self):
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def snapshot(self) -> Optional[SchemaSnapshot]:
+        return self._snapshot
+
+    async def refresh(self, db) -> SchemaSnapshot:
+        rows = (await db.execute(
+            text("""
+                SELECT c.relname AS table_name, a.attname AS column_name
+                FROM pg_catalog.pg_class c
+                JOIN pg_catalog.pg_namespace n ON n.oid = c.relnamespace
+                LEFT JOIN pg_catalog.pg_attribute a
+                       ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+                WHERE n.nspname = :schema
+                  AND c.relkind IN ('r', 'p', 'v', 'm')
+                  AND c.relname = ANY(:tables)
+            """),
+            {"schema": SCHEMA, "tables": list(REQUIRED_TABLES + OPTIONAL_TABLES)},
+        )).mappings().all()
+        self._snapshot = SchemaSnapshot(rows)
+        return self._snapshot
+
+    async def get(self, db) -> SchemaSnapshot:
+        """Current snapshot; loaded through `db` if startup could not load it."""
+        if self._snapshot is None:
+            async with self._lock:
+                if self._snapshot is None:
+                    await self.refresh(db)
+        return self._snapshot
+
+    async def has_column(self, db, table: str, column: str) -> bool:
+        return (await self.get(db)).has_column(table, column)
+
+    async def feature_ready(self, db, feature: str) -> bool:
+        """True once every table of `feature` (a FEATURE_TABLES key) exists."""
+        return not (await self.get(db)).missing_feature_tables(feature)
+
+    async def refresh_with(self, session_factory) -> SchemaSnapshot:
+        db = session_factory()
+        try:
+            return await self.refresh(ThreadedSession(db))
+        finally:
+            await run_in_threadpool(db.close)
+
+    def install_sighup_reload(self, session_factory) -> None:
+        """Reload on SIGHUP (`kill -HUP <pid>`); a no-op where signals are unsupported."""
+        loop = asyncio.get_running_loop()
+
+        async def reload():
+            try:
+                snapshot = await self.refresh_with(session_factory)
+                logger.info("Schema registry reloaded (%d tables)", len(snapshot.tables))
+            except Exception:
+                logger.exception("Schema registry reload failed; keeping the previous snapshot")
+
+        try:
+            loop.add_signal_handler(signal.SIGHUP, lambda: loop.create_task(reload()))
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass
+
+    def check_required(self, mode: str) -> None:
+        """Raise SchemaError (strict) or log (warn) when required tables are missing."""
+        if mode == "off" or self._snapshot is None:
+            return
+        for feature in FEATURE_TABLES:
+            unmigrated = self._snapshot.missing_feature_tables(feature)
+            if unmigrated:
+                logger.warning(
+                    "Feature %r is unavailable until its tables exist in schema %s: %s",
+                    feature, SCHEMA, ", ".join(unmigrated),
+                )
+        missing = self._snapshot.missing_tables()
+        if not missing:
+            return
+        message = f"Missing required tables in schema {SCHEMA}: {', '.join(missing)}"
+        if mode == "strict":
+            raise SchemaError(message)
+        logger.warning(message)
+
+
+schema_registry = SchemaRegistry()
@@ -1,7 +1,10 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import FrozenResult
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import get_database_url  # <-- new helper (you must add it)
+from app.core.config import DB_ASYNC, DB_MAX_OVERFLOW, DB_POOL_SIZE, get_async_database_url
 
 DATABASE_URL = get_database_url()
 
@@ -20,6 +23,21 @@ else:
     SessionLocal = None
     print("DATABASE_URL (safe): <missing>")
 
+if DATABASE_URL and DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        get_async_database_url(),
+        pool_pre_ping=True,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    print("DB_ASYNC: asyncpg engine enabled")
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
 def get_db():
     if SessionLocal is None:
         raise RuntimeError(
@@ -30,3 +48,55 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+class ThreadedSession:
+    """
+    Awaitable facade over a sync Session, used when DB_ASYNC is off.
+
+    Exposes the subset of AsyncSession that async endpoints use (execute,
+    commit, rollback). Each call runs in the threadpool and row results are
+    buffered there, so nothing touches the pg8000 connection on the event loop.
+    """
+
+    def __init__(self, session):
+        self.sync_session = session
+
+    async def execute(self, statement, params=None):
+        def run():
+            result = self.sync_session.execute(statement, params)
+            # ORM results always return rows; CursorResult knows if it does
+            return result.freeze() if getattr(result, "returns_rows", True) else result
+
+        result = await run_in_threadpool(run)
+        return result() if isinstance(result, FrozenResult) else result
+
+    async def commit(self):
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self):
+        await run_in_threadpool(self.sync_session.rollback)
+
+
+async def get_async_db():
+    """
+    Session provider for `async def` endpoints.
+
+    Yields an AsyncSession on the asyncpg engine when DB_ASYNC is set, otherwise
+    a ThreadedSession over the sync engine. Both support
+    `await db.execute(...)`, `await db.commit()` and `await db.rollback()`.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
+
+    if SessionLocal is None:
+        raise RuntimeError(
+            "Database is not configured. Set DATABASE_URL (recommended) or DB_* env vars in Cloud Run."
+        )
+    db = SessionLocal()
+    try:
+        yield ThreadedSession(db)
+    finally:
+        await run_in_threadpool(db.close)
@@ -1,3 +1,6 @@
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
@@ -8,8 +11,37 @@ import os
 load_dotenv()
 
 from app.api.v1.router import api_router
+from app.auth import kdf_pool
+from app.core.config import SCHEMA_CHECK
+from app.db.schema_registry import schema_registry
+from app.db.session import SessionLocal
+from app.services.course_ingest import ingest_queue
+from app.services.progress_buffer import progress_buffer
+from app.services.role_registry import role_registry
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background flusher for buffered progress events (needs the DB)
+    if SessionLocal is not None:
+        # Fail fast on missing tables; an unreachable DB only defers the load
+        try:
+            await schema_registry.refresh_with(SessionLocal)
+        except Exception:
+            logging.getLogger(__name__).exception("Could not introspect the schema at startup")
+        schema_registry.check_required(SCHEMA_CHECK)
+        schema_registry.install_sighup_reload(SessionLocal)
+
+        progress_buffer.start(SessionLocal)
+        ingest_queue.start(SessionLocal)
+        await role_registry.load_at_startup(SessionLocal)
+    yield
+    progress_buffer.stop()
+    ingest_queue.stop()
+    kdf_pool.shutdown()
+
 
-app = FastAPI(title="IMC FastAPI Starter", version="0.1.0")
+app = FastAPI(title="IMC FastAPI Starter", version="0.1.0", lifespan=lifespan)
 
 # Add session middleware for OAuth
 app.add_middleware(
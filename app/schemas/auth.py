@@ -1,3 +1,5 @@
+from datetime import date
+
 from pydantic import BaseModel, EmailStr, Field
 
 
@@ -33,7 +35,7 @@ class RegisterRequest(BaseModel):
     password: str = Field(min_length=8)
 
     phone: str | None = None
-    dob: str | None = None         # "YYYY-MM-DD"
+    dob: date | None = None        # "YYYY-MM-DD"
     gender: str | None = None      # "male" | "female" | "other" | etc.
     address: str | None = None
 
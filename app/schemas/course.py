@@ -32,7 +32,7 @@ class CourseOut(BaseModel):
     price: Optional[float] = None
     level: Optional[str] = None
     category: Optional[str] = None
-    lessons: Optional[int] = Field(default=0, serialization_alias="lessons")
+    lessons: Optional[int] = Field(default=0, validation_alias="chapter_count", serialization_alias="lessons")
     minAge: Optional[int] = Field(default=None, validation_alias="min_age", serialization_alias="minAge")
     maxAge: Optional[int] = Field(default=None, validation_alias="age_max", serialization_alias="maxAge")
     is_active: bool
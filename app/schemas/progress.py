@@ -0,0 +1,23 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class ProgressEvent(BaseModel):
+    course_id: int
+    lesson_id: int
+    # viewed: lesson opened, progress: heartbeat with percent watched, completed: lesson done
+    event: Literal["viewed", "progress", "completed"]
+    percent: Optional[float] = Field(default=None, ge=0, le=100)
+    occurred_at: Optional[datetime] = None
+
+
+class ProgressEventBatch(BaseModel):
+    # Defaults to the caller; only an admin may name another student
+    student_id: Optional[int] = None
+    events: list[ProgressEvent] = Field(..., min_length=1, max_length=500)
+
+
+class ProgressEventAck(BaseModel):
+    accepted: int
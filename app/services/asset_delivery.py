@@ -0,0 +1,168 @@
+"""
+Delivery of uploaded course videos and PDFs.
+
+Clients ask GET /assets/{asset_id} for a playback URL and then fetch the bytes
+from that URL directly, with as many Range requests as scrubbing needs:
+
+- GCS: a V4 signed URL; GCS itself serves the ranges.
+- Local storage: an HMAC-signed GET /media/{object_name} URL, served by
+  `media_file_response` (Range/206, If-Modified-Since/304, and zero-copy
+  sends where the ASGI server supports them).
+
+Signing is not free (GCS on Cloud Run signs through an IAM API call), so
+URLs are cached per (object, user) and reused until ASSET_URL_MIN_REMAINING
+seconds before they expire.
+"""
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Optional
+
+import anyio
+from fastapi import Request, Response
+from starlette.concurrency import run_in_threadpool
+
+from app.core.cache import TTLCache
+from app.core.config import ASSET_URL_CACHE_SIZE, ASSET_URL_MIN_REMAINING, ASSET_URL_TTL
+from app.core.etag import etag_matches
+from app.services.storage import StorageBackend
+
+asset_url_cache = TTLCache(ASSET_URL_CACHE_SIZE, ttl=0)
+
+MEDIA_CHUNK_SIZE = 256 * 1024
+
+
+async def issue_asset_url(storage: StorageBackend, object_name: str, user_id: int, content_type: str) -> tuple[str, int]:
+    """(url, expires_at) for reading `object_name`, reused while it has time left."""
+    key = (storage.bucket, object_name, user_id, content_type)
+    cached = asset_url_cache.get(key)
+    if cached is not None:
+        return cached
+    expires_at = int(time.time()) + ASSET_URL_TTL
+    url = await run_in_threadpool(storage.signed_url, object_name, expires_at, user_id, content_type)
+    asset_url_cache.set(key, (url, expires_at), ttl=max(0, ASSET_URL_TTL - ASSET_URL_MIN_REMAINING))
+    return url, expires_at
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    (start, end) inclusive for a single `bytes=` range, or None to send the
+    whole file (no range, multiple ranges, or a malformed header). Raises
+    ValueError when the range lies outside the file.
+    """
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, dash, last = spec.strip().partition("-")
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    end = min(end, size - 1)
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _not_modified_since(header: Optional[str], mtime: float) -> bool:
+    if not header:
+        return False
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have one-second resolution
+    return int(mtime) <= since.timestamp()
+
+
+class FileRangeResponse(Response):
+    """Sends `length` bytes of a file from `offset`, zero-copy when the server allows."""
+
+    def __init__(self, path: Path, offset: int, length: int, file_size: int, status_code: int, headers: dict):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.file_size = file_size
+        self.status_code = status_code
+        self.background = None
+        self.init_headers(headers)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or not self.length:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.pathsend" in extensions and self.offset == 0 and self.length == self.file_size:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        async with await anyio.open_file(self.path, "rb") as file:
+            if "http.response.zerocopysend" in extensions:
+                # The server sendfile()s straight from the descriptor
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file.wrapped,
+                    "offset": self.offset,
+                    "count": self.length,
+                })
+                return
+            await file.seek(self.offset)
+            remaining = self.length
+            while remaining:
+                chunk = await file.read(min(MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining:
+                # The file shrank underneath us; end the body anyway
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def media_file_response(request: Request, path: Path, content_type: str, max_age: int) -> Response:
+    """Serve a local file with conditional GET and single-range support."""
+    stat = os.stat(path)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": f"private, max-age={max(0, max_age)}",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, etag) or (
+        if_none_match is None and _not_modified_since(request.headers.get("if-modified-since"), stat.st_mtime)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range: only honour the range if the client's copy is still current
+    if range_header and (if_range is None or if_range in (etag, last_modified)):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+
+    headers["Content-Type"] = content_type
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        return FileRangeResponse(path, 0, size, size, 200, headers)
+    start, end = byte_range
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return FileRangeResponse(path, start, end - start + 1, size, 206, headers)
@@ -0,0 +1,320 @@
+"""
+Background ingestion of admin course submissions.
+
+In job mode, POST /admin/courses/submit?mode=job only receives the body:
+files are streamed to a local staging area (fast local disk), the request
+returns 202 with a job id, and an IngestQueue worker thread does the slow
+part. It copies each staged file to the real storage backend in chunks
+(content-addressed, see app/services/storage.py), reporting per-asset
+progress, then inserts the course and asset rows in one transaction.
+GET /admin/courses/jobs/{job_id} reports the status.
+
+The queue is in-process (no broker): a job lives on the instance that
+accepted it. On shutdown running jobs finish, while queued jobs are marked
+failed and must be resubmitted; a killed instance loses both, and its staged
+files are swept by the next start. Staged bytes are capped by
+INGEST_STAGING_MAX_BYTES. Finished jobs are kept for INGEST_JOB_RETENTION
+seconds for polling.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import (
+    INGEST_JOB_RETENTION,
+    INGEST_QUEUE_MAX,
+    INGEST_STAGING_MAX_AGE,
+    INGEST_STAGING_MAX_BYTES,
+    INGEST_STAGING_ROOT,
+    INGEST_WORKERS,
+)
+from app.db.models import Course, CourseAsset
+from app.services.storage import LocalStorage, StorageBackend, StoredObject, get_storage
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class IngestQueueFull(Exception):
+    pass
+
+
+def stored_columns(stored: StoredObject) -> dict[str, Any]:
+    """The course_assets columns describing an uploaded object."""
+    return {
+        "gcs_bucket": stored.bucket,
+        "gcs_object": stored.object_name,
+        "file_url": stored.public_url,
+        "mime_type": stored.content_type,
+        "size_bytes": stored.size,
+        "content_sha256": stored.sha256,
+    }
+
+
+def course_insert(plan: dict[str, Any]):
+    return insert(Course).values(**plan["course"]).returning(Course.course_id)
+
+
+def asset_insert_rows(plan: dict[str, Any], course_id: int, created_by: Optional[int]) -> list[dict]:
+    return [{**row, "course_id": course_id, "created_by": created_by} for row in plan["rows"]]
+
+
+def write_course(db, plan: dict[str, Any], created_by: Optional[int]) -> int:
+    """Insert the course and its asset rows on a sync Session and commit."""
+    course_id = db.execute(course_insert(plan)).scalar()
+    if plan["rows"]:
+        db.execute(insert(CourseAsset), asset_insert_rows(plan, course_id, created_by))
+    db.commit()
+    return course_id
+
+
+@dataclass
+class AssetProgress:
+    file_key: str
+    row: dict                 # the course_assets row, filled in once uploaded
+    staged_object: str
+    content_type: str
+    size: int
+    uploaded: int = 0
+    status: str = "pending"   # pending / uploading / done / failed
+    stored: Optional[StoredObject] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "file_key": self.file_key,
+            "status": self.status,
+            "size_bytes": self.size,
+            "uploaded_bytes": self.uploaded,
+            "percent": round(self.uploaded * 100 / self.size, 1) if self.size else 100.0,
+            "deduplicated": bool(self.stored and self.stored.deduplicated),
+        }
+
+
+@dataclass
+class IngestJob:
+    plan: dict[str, Any]
+    assets: list[AssetProgress]
+    created_by: Optional[int]
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"    # queued / running / succeeded / failed
+    course_id: Optional[int] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        total = sum(a.size for a in self.assets)
+        done = sum(a.uploaded for a in self.assets)
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "course_id": self.course_id,
+            "error": self.error,
+            "percent": round(done * 100 / total, 1) if total else (100.0 if self.finished_at else 0.0),
+            "assets": [a.to_dict() for a in self.assets],
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestQueue:
+    def __init__(
+        self,
+        workers: int = INGEST_WORKERS,
+        max_queued: int = INGEST_QUEUE_MAX,
+        retention: float = INGEST_JOB_RETENTION,
+        staging_root: str = INGEST_STAGING_ROOT,
+        max_staged_bytes: int = INGEST_STAGING_MAX_BYTES,
+    ):
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.retention = retention
+        self.max_staged_bytes = max_staged_bytes
+        # Bytes of staged files not yet cleaned up (queued and running jobs)
+        self.staged_bytes = 0
+        self.session_factory: Optional[Callable] = None
+        self.storage: Optional[StorageBackend] = None
+        # Request bodies land here; never served, so no public URL
+        self.staging = LocalStorage(staging_root, base_url="")
+        self._queue: "queue.Queue[Optional[IngestJob]]" = queue.Queue()
+        self._jobs: dict[str, IngestJob] = {}
+        self._lock = threading.Lock()
+        self._threads: list[threading.Thread] = []
+        self._finish_listeners: list[Callable[[IngestJob], None]] = []
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return bool(self._threads) and not self._stopping
+
+    def has_room(self, nbytes: int) -> bool:
+        """Whether `nbytes` more can be staged (checked before reading a body)."""
+        return self.staged_bytes + nbytes <= self.max_staged_bytes
+
+    def add_finish_listener(self, listener: Callable[[IngestJob], None]) -> None:
+        """`listener(job)` runs after a job succeeds."""
+        self._finish_listeners.append(listener)
+
+    def submit(self, job: IngestJob) -> IngestJob:
+        size = sum(asset.size for asset in job.assets)
+        with self._lock:
+            self._prune()
+            if self._stopping or self._queue.qsize() >= self.max_queued or not self.has_room(size):
+                raise IngestQueueFull()
+            self._jobs[job.job_id] = job
+            self.staged_bytes += size
+            self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.retention
+        for job_id in [j.job_id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def _remove_staged(self, job: IngestJob) -> None:
+        for asset in job.assets:
+            try:
+                path = self.staging.path_for(asset.staged_object)
+                path.unlink(missing_ok=True)
+                # Drop the submission's now-empty directories too
+                for parent in path.parents:
+                    if parent == self.staging.root:
+                        break
+                    parent.rmdir()
+            except OSError:
+                pass  # a directory still in use by another job
+            except Exception:
+                logger.exception("Could not delete staged %s", asset.staged_object)
+        with self._lock:
+            self.staged_bytes -= sum(asset.size for asset in job.assets)
+
+    def _discard(self, job: IngestJob, reason: str) -> None:
+        job.status = "failed"
+        job.error = reason
+        self._remove_staged(job)
+        job.finished_at = time.time()
+
+    def sweep_staging(self, max_age: float = INGEST_STAGING_MAX_AGE) -> int:
+        """Delete staged files older than `max_age`, left by a process that died."""
+        removed = 0
+        cutoff = time.time() - max_age
+        for dirpath, _, filenames in os.walk(self.staging.root, topdown=False):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        os.unlink(path)
+                        removed += 1
+                except OSError:
+                    pass
+            if dirpath != str(self.staging.root):
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+        return removed
+
+    def _copy(self, asset: AssetProgress) -> None:
+        asset.status = "uploading"
+        # Named by content hash; an identical file already stored is reused
+        writer = self.storage.open_writer(None, asset.content_type)
+        try:
+            with self.staging.path_for(asset.staged_object).open("rb") as source:
+                while chunk := source.read(COPY_CHUNK_SIZE):
+                    writer.write(chunk)
+                    asset.uploaded += len(chunk)
+            asset.stored = writer.commit()
+        except BaseException:
+            writer.abort()
+            asset.status = "failed"
+            raise
+        asset.row.update(stored_columns(asset.stored))
+        asset.status = "done"
+
+    def process(self, job: IngestJob) -> None:
+        job.status = "running"
+        try:
+            for asset in job.assets:
+                self._copy(asset)
+
+            db = self.session_factory()
+            try:
+                job.course_id = write_course(db, job.plan, job.created_by)
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            job.status = "succeeded"
+        except Exception as e:
+            logger.exception("Course ingestion job %s failed", job.job_id)
+            job.status = "failed"
+            job.error = str(e)
+            # Uploaded objects are content-addressed and possibly shared, so
+            # they stay; resubmitting the same files reuses them
+        finally:
+            self._remove_staged(job)
+            job.finished_at = time.time()
+
+        if job.status == "succeeded":
+            for listener in self._finish_listeners:
+                try:
+                    listener(job)
+                except Exception:
+                    logger.exception("Ingestion finish listener failed")
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            self.process(job)
+
+    def start(self, session_factory: Callable, storage: Optional[StorageBackend] = None) -> None:
+        if self._threads:
+            return
+        self.session_factory = session_factory
+        self.storage = storage or get_storage()
+        self._stopping = False
+        try:
+            swept = self.sweep_staging()
+            if swept:
+                logger.info("Removed %d stale staged upload(s)", swept)
+        except Exception:
+            logger.exception("Could not sweep %s", self.staging.root)
+        for n in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"course-ingest-{n}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Let running jobs finish; fail queued ones so shutdown does not wait for them."""
+        with self._lock:
+            self._stopping = True
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._discard(job, "Server shut down before the job started; please resubmit")
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+ingest_queue = IngestQueue()
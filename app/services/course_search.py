@@ -0,0 +1,231 @@
+"""
+Ranked course search over course_name, category and description.
+
+Two backends share one entry point, `search_courses`:
+
+- postgres: a weighted tsvector column (`imc.courses.search_vector`) plus a
+  pg_trgm index on course_name, created by scripts/add_course_search_index.py.
+- memory: an in-process inverted index rebuilt from imc.courses, used when the
+  extension or column is not available.
+
+Both return (course_id, score) pairs ordered by score DESC, course_id DESC so
+callers can page with offset or with a (score, course_id) keyset. `db` is
+the session from get_async_db (AsyncSession or ThreadedSession).
+"""
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from typing import Optional
+
+from sqlalchemy import text
+
+from app.core.config import CATALOG_CACHE_TTL, COURSE_SEARCH_BACKEND, COURSE_SEARCH_DETECT_RETRY
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Field weights mirror setweight() A/B/C in the Postgres index
+FIELD_WEIGHTS = (("course_name", 3.0), ("category", 2.0), ("description", 1.0))
+
+_backend: Optional[str] = None
+# monotonic time after which a "memory" fallback is detected again
+_backend_recheck_at = 0.0
+
+
+def tokenize(value: Optional[str]) -> list[str]:
+    return _TOKEN_RE.findall((value or "").lower())
+
+
+def _prefix_tsquery(tokens: list[str]) -> str:
+    # Every word must match; the last one may be partial (search-as-you-type)
+    return " & ".join(tokens[:-1] + [tokens[-1] + ":*"])
+
+
+async def _detect_backend(db) -> str:
+    if COURSE_SEARCH_BACKEND in {"postgres", "memory"}:
+        return COURSE_SEARCH_BACKEND
+    try:
+        ready = (await db.execute(
+            text("""
+                SELECT
+                    EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')
+                    AND EXISTS (
+                        SELECT 1 FROM pg_attribute
+                        WHERE attrelid = 'imc.courses'::regclass
+                          AND attname = 'search_vector'
+                          AND NOT attisdropped
+                    )
+            """)
+        )).scalar()
+    except Exception:
+        await db.rollback()
+        ready = False
+    return "postgres" if ready else "memory"
+
+
+async def get_backend(db) -> str:
+    """
+    The search backend. Postgres, once found, is kept for the life of the
+    process; a fallback to memory (index not migrated yet, or the check
+    itself failed) is re-checked every COURSE_SEARCH_DETECT_RETRY seconds.
+    """
+    global _backend, _backend_recheck_at
+    if _backend == "postgres" or (_backend is not None and time.monotonic() < _backend_recheck_at):
+        return _backend
+    _backend = await _detect_backend(db)
+    _backend_recheck_at = time.monotonic() + COURSE_SEARCH_DETECT_RETRY
+    return _backend
+
+
+class CourseSearchIndex:
+    """Token -> {course_id: weight} postings with a sorted vocabulary for prefix lookups."""
+
+    def __init__(self, rows):
+        self.postings: dict[str, dict[int, float]] = {}
+        self.active: set[int] = set()
+        for row in rows:
+            course_id = row["course_id"]
+            if row["is_active"]:
+                self.active.add(course_id)
+            for field, weight in FIELD_WEIGHTS:
+                for token in tokenize(row[field]):
+                    bucket = self.postings.setdefault(token, {})
+                    bucket[course_id] = bucket.get(course_id, 0.0) + weight
+        self.vocabulary = sorted(self.postings)
+
+    def _expand(self, token: str, prefix: bool) -> list[str]:
+        if not prefix:
+            return [token] if token in self.postings else []
+        start = bisect_left(self.vocabulary, token)
+        out = []
+        for word in self.vocabulary[start:]:
+            if not word.startswith(token):
+                break
+            out.append(word)
+        return out
+
+    def search(self, term: str, active_only: bool = False) -> list[tuple[int, float]]:
+        tokens = tokenize(term)
+        if not tokens:
+            return []
+
+        scores: Optional[dict[int, float]] = None
+        for i, token in enumerate(tokens):
+            matched: dict[int, float] = {}
+            for word in self._expand(token, prefix=i == len(tokens) - 1):
+                # Exact words outrank prefix completions
+                boost = 1.0 if word == token else 0.5
+                for course_id, weight in self.postings[word].items():
+                    matched[course_id] = max(matched.get(course_id, 0.0), weight * boost)
+            if scores is None:
+                scores = matched
+            else:
+                scores = {cid: s + matched[cid] for cid, s in scores.items() if cid in matched}
+            if not scores:
+                return []
+
+        results = [
+            (course_id, score)
+            for course_id, score in scores.items()
+            if not active_only or course_id in self.active
+        ]
+        results.sort(key=lambda r: (r[1], r[0]), reverse=True)
+        return results
+
+
+_index: Optional[CourseSearchIndex] = None
+_index_built_at = 0.0
+_index_lock = asyncio.Lock()
+
+
+def invalidate_search_index() -> None:
+    """Drop the in-memory index; the next search rebuilds it."""
+    global _index
+    _index = None
+
+
+def _index_is_stale() -> bool:
+    # Rebuild on the catalog TTL too, so writes made by other instances show up
+    return _index is None or time.monotonic() - _index_built_at > CATALOG_CACHE_TTL
+
+
+async def _get_index(db) -> CourseSearchIndex:
+    global _index, _index_built_at
+    if not _index_is_stale():
+        return _index
+    async with _index_lock:
+        if _index_is_stale():
+            rows = (await db.execute(
+                text("""
+                    SELECT course_id, course_name, description, category, is_active
+                    FROM imc.courses
+                """)
+            )).mappings().all()
+            _index = CourseSearchIndex(rows)
+            _index_built_at = time.monotonic()
+        return _index
+
+
+async def _search_postgres(
+    db,
+    term: str,
+    active_only: bool,
+    limit: int,
+    offset: int,
+    after: Optional[tuple[float, int]],
+) -> list[tuple[int, float]]:
+    tokens = tokenize(term)
+    if not tokens:
+        return []
+
+    filters = []
+    params = {"term": term, "tsq": _prefix_tsquery(tokens), "limit": limit, "offset": offset}
+    if active_only:
+        filters.append("c.is_active")
+    keyset = ""
+    if after is not None:
+        keyset = "WHERE (s.score, s.course_id) < (:after_score, :after_id)"
+        params["after_score"], params["after_id"] = after
+
+    rows = (await db.execute(
+        text(f"""
+            SELECT s.course_id, s.score
+            FROM (
+                SELECT
+                    c.course_id,
+                    (ts_rank(c.search_vector, q.tsq) + word_similarity(:term, c.course_name))::float8 AS score
+                FROM imc.courses c, to_tsquery('simple', :tsq) AS q(tsq)
+                WHERE (c.search_vector @@ q.tsq OR :term <% c.course_name)
+                {"".join(" AND " + f for f in filters)}
+            ) s
+            {keyset}
+            ORDER BY s.score DESC, s.course_id DESC
+            LIMIT :limit OFFSET :offset
+        """),
+        params,
+    )).all()
+    return [(row[0], row[1]) for row in rows]
+
+
+async def search_courses(
+    db,
+    term: str,
+    active_only: bool = False,
+    limit: int = 50,
+    offset: int = 0,
+    after: Optional[tuple[float, int]] = None,
+) -> list[tuple[int, float]]:
+    """
+    Return up to `limit` (course_id, score) pairs, best match first.
+
+    `after` is the (score, course_id) of the last row already seen and takes
+    precedence over `offset`.
+    """
+    if await get_backend(db) == "postgres":
+        return await _search_postgres(db, term, active_only, limit, 0 if after else offset, after)
+
+    results = (await _get_index(db)).search(term, active_only=active_only)
+    if after is not None:
+        results = [r for r in results if (r[1], r[0]) < after]
+        offset = 0
+    return results[offset:offset + limit]
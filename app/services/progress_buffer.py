@@ -0,0 +1,442 @@
+"""
+Buffered ingestion of lesson progress events.
+
+Heartbeats are coalesced in memory per (user_id, lesson_id) - highest percent,
+completion flag, first/last seen - and written by a background thread in
+batches. Each batch is a single statement that UPSERTs imc.lesson_progress
+and recomputes imc.course_progress for just the (user, course) pairs the batch
+touched, from their chapters' lesson progress:
+
+    course_progress = SUM(lesson_pct) / courses.chapter_count
+
+(exactly 100 once every chapter is completed). Recomputing instead of adding
+per-batch deltas keeps rounding from piling up short of 100.
+
+The same statement rolls activity up into imc.student_daily_activity (per user
+and UTC day) and imc.student_activity_stats (one row per user: streak, this
+week's completions, lifetime completions) so the dashboard reads them in O(1).
+Streaks are advanced from each batch's latest day; backdated events that span
+several days in one batch are reconciled by scripts/backfill_activity_rollup.py.
+The tables are created by scripts/add_activity_rollup_tables.py.
+
+Events are checked in the statement itself: a row is written only if its
+lesson is a chapter of the given course (lessons are imc.course_chapters
+rows, matching courses.chapter_count) and the student is actively enrolled
+in that course. Anything else is skipped instead of failing the batch. If a
+chunk still fails, it is split and retried in halves so only the offending
+rows are re-queued, and dropped after MAX_FLUSH_ATTEMPTS.
+
+Events still in the buffer are lost if the process dies; the flush interval
+bounds that window. Shutdown flushes whatever is pending.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import PROGRESS_BUFFER_MAX, PROGRESS_FLUSH_INTERVAL, PROGRESS_FLUSH_SIZE
+
+logger = logging.getLogger(__name__)
+
+# 7 bind parameters per row keeps a full batch well under Postgres' 65535 limit
+MAX_ROWS_PER_STATEMENT = 1000
+
+# A lesson update that fails this many flushes in a row (on its own, see
+# _write_isolating) is dropped, so one bad row cannot wedge the buffer
+MAX_FLUSH_ATTEMPTS = 3
+
+
+class ProgressBufferFull(Exception):
+    pass
+
+
+@dataclass
+class LessonUpdate:
+    user_id: int
+    course_id: int
+    lesson_id: int
+    percent: float
+    completed: bool
+    first_seen: datetime
+    last_seen: datetime
+    attempts: int = 0
+
+    def merge(self, other: "LessonUpdate") -> None:
+        self.percent = max(self.percent, other.percent)
+        self.completed = self.completed or other.completed
+        self.first_seen = min(self.first_seen, other.first_seen)
+        self.last_seen = max(self.last_seen, other.last_seen)
+        # New data gets a fresh set of attempts
+        self.attempts = 0
+
+
+def _upsert_sql(row_count: int) -> str:
+    rows = ",\n".join(
+        f"(CAST(:u{i} AS bigint), CAST(:c{i} AS bigint), CAST(:l{i} AS bigint), "
+        f"CAST(:p{i} AS numeric), CAST(:d{i} AS boolean), "
+        f"CAST(:f{i} AS timestamptz), CAST(:t{i} AS timestamptz))"
+        for i in range(row_count)
+    )
+    return f"""
+        WITH raw_ev (user_id, course_id, lesson_id, pct, completed, first_seen, last_seen) AS (
+            VALUES {rows}
+        ),
+        -- Client-supplied ids: keep lessons of the given course, for students
+        -- actively enrolled in it
+        ev AS (
+            SELECT r.*
+            FROM raw_ev r
+            JOIN imc.course_chapters ch ON ch.chapter_id = r.lesson_id AND ch.course_id = r.course_id
+            WHERE EXISTS (
+                SELECT 1
+                FROM imc.enrollments e
+                WHERE e.user_id = r.user_id AND e.course_id = r.course_id AND e.status = 'active'
+            )
+        ),
+        before AS (
+            SELECT lp.user_id, lp.lesson_id, lp.progress_percent, lp.status, lp.last_viewed_at
+            FROM imc.lesson_progress lp
+            JOIN ev ON ev.user_id = lp.user_id AND ev.lesson_id = lp.lesson_id
+        ),
+        upserted AS (
+            INSERT INTO imc.lesson_progress AS lp
+                (user_id, lesson_id, status, started_at, completed_at, last_viewed_at, progress_percent)
+            SELECT
+                user_id,
+                lesson_id,
+                CASE WHEN completed THEN 'completed' ELSE 'in_progress' END,
+                first_seen,
+                CASE WHEN completed THEN last_seen END,
+                last_seen,
+                CASE WHEN completed THEN 100 ELSE pct END
+            FROM ev
+            ON CONFLICT (user_id, lesson_id) DO UPDATE SET
+                progress_percent = GREATEST(lp.progress_percent, EXCLUDED.progress_percent),
+                status = CASE
+                    WHEN lp.status = 'completed' OR EXCLUDED.status = 'completed' THEN 'completed'
+                    ELSE 'in_progress'
+                END,
+                started_at = COALESCE(lp.started_at, EXCLUDED.started_at),
+                completed_at = COALESCE(lp.completed_at, EXCLUDED.completed_at),
+                last_viewed_at = GREATEST(lp.last_viewed_at, EXCLUDED.last_viewed_at)
+            RETURNING lp.user_id, lp.lesson_id, lp.progress_percent, lp.status, lp.last_viewed_at
+        ),
+        changes AS (
+            SELECT
+                ev.user_id,
+                ev.course_id,
+                ev.first_seen,
+                ev.last_seen,
+                (ev.last_seen AT TIME ZONE 'UTC')::date AS activity_date,
+                u.status = 'completed' AND b.status IS DISTINCT FROM 'completed' AS newly_completed,
+                -- A lesson counts as viewed once per day: only when its
+                -- last_viewed_at moves to a later UTC date (the activity_date day)
+                b.user_id IS NULL
+                    OR (u.last_viewed_at AT TIME ZONE 'UTC')::date
+                       > (b.last_viewed_at AT TIME ZONE 'UTC')::date AS newly_viewed
+            FROM upserted u
+            JOIN ev ON ev.user_id = u.user_id AND ev.lesson_id = u.lesson_id
+            LEFT JOIN before b ON b.user_id = u.user_id AND b.lesson_id = u.lesson_id
+        ),
+        touched AS (
+            SELECT
+                user_id,
+                course_id,
+                MIN(first_seen) AS first_seen,
+                MAX(last_seen) AS last_seen
+            FROM changes
+            GROUP BY user_id, course_id
+        ),
+        -- Every chapter of each touched course with its lesson progress. The
+        -- statement reads lesson_progress as it was before it started, so
+        -- rows written above come from `upserted` instead.
+        course_percent AS (
+            SELECT
+                t.user_id,
+                t.course_id,
+                t.first_seen,
+                t.last_seen,
+                CASE
+                    WHEN bool_and(COALESCE(u.status, lp.status) IS NOT DISTINCT FROM 'completed') THEN 100
+                    ELSE LEAST(
+                        100,
+                        ROUND(
+                            SUM(COALESCE(u.progress_percent, lp.progress_percent, 0))
+                                / GREATEST(MAX(c.chapter_count), 1),
+                            2
+                        )
+                    )
+                END AS pct
+            FROM touched t
+            JOIN imc.courses c ON c.course_id = t.course_id
+            JOIN imc.course_chapters ch ON ch.course_id = t.course_id
+            LEFT JOIN upserted u ON u.user_id = t.user_id AND u.lesson_id = ch.chapter_id
+            LEFT JOIN imc.lesson_progress lp ON lp.user_id = t.user_id AND lp.lesson_id = ch.chapter_id
+            GROUP BY t.user_id, t.course_id, t.first_seen, t.last_seen
+        ),
+        course_upsert AS (
+            INSERT INTO imc.course_progress AS cp
+                (user_id, course_id, progress_percent, last_activity_date, started_at, completed_at)
+            SELECT
+                user_id,
+                course_id,
+                pct,
+                last_seen,
+                first_seen,
+                CASE WHEN pct >= 100 THEN last_seen END
+            FROM course_percent
+            ON CONFLICT (user_id, course_id) DO UPDATE SET
+                progress_percent = EXCLUDED.progress_percent,
+                last_activity_date = GREATEST(cp.last_activity_date, EXCLUDED.last_activity_date),
+                started_at = COALESCE(cp.started_at, EXCLUDED.started_at),
+                -- Follows the recomputed percent; kept from the first time it hit 100
+                completed_at = CASE
+                    WHEN EXCLUDED.progress_percent >= 100
+                    THEN COALESCE(cp.completed_at, EXCLUDED.completed_at)
+                END
+            RETURNING cp.user_id
+        ),
+        daily_upsert AS (
+            INSERT INTO imc.student_daily_activity AS da
+                (user_id, activity_date, lessons_viewed, lessons_completed)
+            SELECT
+                user_id,
+                activity_date,
+                COUNT(*) FILTER (WHERE newly_viewed),
+                COUNT(*) FILTER (WHERE newly_completed)
+            FROM changes
+            GROUP BY user_id, activity_date
+            ON CONFLICT (user_id, activity_date) DO UPDATE SET
+                lessons_viewed = da.lessons_viewed + EXCLUDED.lessons_viewed,
+                lessons_completed = da.lessons_completed + EXCLUDED.lessons_completed
+            RETURNING da.user_id
+        ),
+        batch_day AS (
+            SELECT user_id, MAX(activity_date) AS day
+            FROM changes
+            GROUP BY user_id
+        ),
+        batch_stats AS (
+            SELECT
+                b.user_id,
+                b.day,
+                date_trunc('week', b.day)::date AS week_start,
+                COUNT(*) FILTER (WHERE c.newly_completed) AS completed,
+                COUNT(*) FILTER (
+                    WHERE c.newly_completed AND c.activity_date >= date_trunc('week', b.day)::date
+                ) AS week_completed
+            FROM batch_day b
+            JOIN changes c ON c.user_id = b.user_id
+            GROUP BY b.user_id, b.day
+        )
+        INSERT INTO imc.student_activity_stats AS s
+            (user_id, last_active_date, current_streak, week_start, week_lessons_completed, completed_lessons)
+        SELECT user_id, day, 1, week_start, week_completed, completed
+        FROM batch_stats
+        ON CONFLICT (user_id) DO UPDATE SET
+            current_streak = CASE
+                WHEN EXCLUDED.last_active_date <= s.last_active_date THEN s.current_streak
+                WHEN EXCLUDED.last_active_date = s.last_active_date + 1 THEN s.current_streak + 1
+                ELSE 1
+            END,
+            week_lessons_completed = CASE
+                WHEN EXCLUDED.week_start = s.week_start
+                    THEN s.week_lessons_completed + EXCLUDED.week_lessons_completed
+                WHEN EXCLUDED.week_start > s.week_start THEN EXCLUDED.week_lessons_completed
+                ELSE s.week_lessons_completed
+            END,
+            week_start = GREATEST(s.week_start, EXCLUDED.week_start),
+            last_active_date = GREATEST(s.last_active_date, EXCLUDED.last_active_date),
+            completed_lessons = s.completed_lessons + EXCLUDED.completed_lessons
+    """
+
+
+def _write_chunk(db, chunk: list[LessonUpdate]) -> None:
+    params = {}
+    for i, u in enumerate(chunk):
+        params.update({
+            f"u{i}": u.user_id,
+            f"c{i}": u.course_id,
+            f"l{i}": u.lesson_id,
+            f"p{i}": u.percent,
+            f"d{i}": u.completed,
+            f"f{i}": u.first_seen,
+            f"t{i}": u.last_seen,
+        })
+    db.execute(text(_upsert_sql(len(chunk))), params)
+    db.commit()
+
+
+def _write_isolating(db, chunk: list[LessonUpdate]) -> list[LessonUpdate]:
+    """
+    Write `chunk`, committing what succeeds; returns the updates that failed.
+    A failing chunk is retried in halves down to single rows, so one bad row
+    does not hold back the others. A lost connection fails the whole chunk.
+    """
+    try:
+        _write_chunk(db, chunk)
+        return []
+    except Exception as e:
+        db.rollback()
+        if len(chunk) == 1 or isinstance(e, OperationalError):
+            logger.warning("Progress write of %d lesson updates failed: %s", len(chunk), e)
+            return chunk
+    middle = len(chunk) // 2
+    return _write_isolating(db, chunk[:middle]) + _write_isolating(db, chunk[middle:])
+
+
+def write_progress_batch(db, updates: list[LessonUpdate]) -> list[LessonUpdate]:
+    """
+    Write coalesced lesson updates (unique per user/lesson), one transaction
+    per chunk. Returns the updates that could not be written.
+    """
+    failed: list[LessonUpdate] = []
+    for start in range(0, len(updates), MAX_ROWS_PER_STATEMENT):
+        failed += _write_isolating(db, updates[start:start + MAX_ROWS_PER_STATEMENT])
+    return failed
+
+
+class ProgressBuffer:
+    def __init__(
+        self,
+        session_factory: Optional[Callable] = None,
+        flush_size: int = PROGRESS_FLUSH_SIZE,
+        flush_interval: float = PROGRESS_FLUSH_INTERVAL,
+        max_pending: int = PROGRESS_BUFFER_MAX,
+    ):
+        self.session_factory = session_factory
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: dict[tuple[int, int], LessonUpdate] = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._listeners: list[Callable[[set[int]], None]] = []
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def add_flush_listener(self, listener: Callable[[set[int]], None]) -> None:
+        """`listener(user_ids)` runs after each successful flush."""
+        self._listeners.append(listener)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def add(self, user_id: int, events: Iterable) -> int:
+        now = datetime.now(timezone.utc)
+        count = 0
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                raise ProgressBufferFull()
+            for ev in events:
+                seen = ev.occurred_at or now
+                if seen.tzinfo is None:
+                    seen = seen.replace(tzinfo=timezone.utc)
+                if ev.event == "completed":
+                    percent = 100.0
+                elif ev.event == "progress" and ev.percent is not None:
+                    percent = float(ev.percent)
+                else:
+                    percent = 0.0
+                update = LessonUpdate(
+                    user_id=user_id,
+                    course_id=ev.course_id,
+                    lesson_id=ev.lesson_id,
+                    percent=percent,
+                    completed=ev.event == "completed",
+                    first_seen=seen,
+                    last_seen=seen,
+                )
+                key = (user_id, ev.lesson_id)
+                if key in self._pending:
+                    self._pending[key].merge(update)
+                else:
+                    self._pending[key] = update
+                count += 1
+            if len(self._pending) >= self.flush_size:
+                self._cond.notify()
+        return count
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._cond:
+                batch, self._pending = self._pending, {}
+            if not batch:
+                return 0
+
+            updates = list(batch.values())
+            db = self.session_factory()
+            try:
+                failed = write_progress_batch(db, updates)
+            except Exception:
+                # Not even a session: nothing was written
+                logger.exception("Progress flush failed")
+                failed = updates
+            finally:
+                db.close()
+
+            if failed:
+                logger.error("Re-queueing %d of %d lesson updates", len(failed), len(updates))
+                with self._cond:
+                    for update in failed:
+                        key = (update.user_id, update.lesson_id)
+                        update.attempts += 1
+                        if update.attempts >= MAX_FLUSH_ATTEMPTS:
+                            logger.error("Dropping progress for user=%s lesson=%s", *key)
+                            continue
+                        if key in self._pending:
+                            update.merge(self._pending[key])
+                        self._pending[key] = update
+
+            failed_ids = {id(update) for update in failed}
+            written = [update for update in updates if id(update) not in failed_ids]
+            if not written:
+                return 0
+            user_ids = {update.user_id for update in written}
+            for listener in self._listeners:
+                try:
+                    listener(user_ids)
+                except Exception:
+                    logger.exception("Progress flush listener failed")
+            return len(written)
+
+    def _run(self) -> None:
+        while True:
+            deadline = time.monotonic() + self.flush_interval
+            with self._cond:
+                while not self._stopping and len(self._pending) < self.flush_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopping = self._stopping
+            self.flush()
+            if stopping:
+                return
+
+    def start(self, session_factory: Optional[Callable] = None) -> None:
+        if session_factory is not None:
+            self.session_factory = session_factory
+        if self._thread is not None or self.session_factory is None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="progress-flush", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._thread = None
+
+
+progress_buffer = ProgressBuffer()
@@ -0,0 +1,118 @@
+"""
+Process-wide registry of imc.roles.
+
+The roles table is a handful of rows that effectively never change, so it is
+loaded once at startup (see the lifespan in app/main.py) and served from
+memory by /roles and the auth endpoints. Callers go through `get(db)`, which
+reloads the snapshot once it is older than ROLES_CACHE_TTL; `invalidate()`
+forces a reload on the next call. A lookup that misses reloads at most once
+per MISS_RELOAD_INTERVAL, so a newly added role is picked up without letting
+bogus role ids turn into a query per request.
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import ROLES_CACHE_TTL
+from app.core.etag import RenderedJSON, render
+from app.db.session import ThreadedSession
+
+logger = logging.getLogger(__name__)
+
+MISS_RELOAD_INTERVAL = 5.0
+
+DEFAULT_ROLE = "student"
+
+
+@dataclass(frozen=True)
+class Role:
+    role_id: int
+    role_name: str
+
+
+class RoleSnapshot:
+    """Immutable view of imc.roles; replaced wholesale on reload."""
+
+    def __init__(self, rows):
+        self.roles = [Role(row["role_id"], row["role_name"]) for row in rows]
+        self.by_id = {role.role_id: role for role in self.roles}
+        self.by_name = {role.role_name.lower(): role for role in self.roles}
+        self.rendered: RenderedJSON = render(
+            [{"role_id": role.role_id, "role_name": role.role_name} for role in self.roles]
+        )
+        self.loaded_at = time.monotonic()
+
+    def lookup(self, role_id: Optional[int] = None, role_name: Optional[str] = None) -> Optional[Role]:
+        if role_id is not None:
+            return self.by_id.get(role_id)
+        if role_name is not None:
+            return self.by_name.get(role_name.strip().lower())
+        return None
+
+
+class RoleRegistry:
+    def __init__(self, ttl: float = ROLES_CACHE_TTL):
+        self.ttl = ttl
+        self._snapshot: Optional[RoleSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    def _is_stale(self) -> bool:
+        return self._snapshot is None or time.monotonic() - self._snapshot.loaded_at > self.ttl
+
+    async def refresh(self, db) -> RoleSnapshot:
+        rows = (await db.execute(
+            text("""
+                SELECT role_id, role_name
+                FROM imc.roles
+                ORDER BY role_id ASC
+            """)
+        )).mappings().all()
+        self._snapshot = RoleSnapshot(rows)
+        return self._snapshot
+
+    async def get(self, db) -> RoleSnapshot:
+        """Current snapshot, reloaded through `db` if missing or past the TTL."""
+        if not self._is_stale():
+            return self._snapshot
+        async with self._lock:
+            if self._is_stale():
+                await self.refresh(db)
+            return self._snapshot
+
+    async def lookup(
+        self, db, role_id: Optional[int] = None, role_name: Optional[str] = None
+    ) -> Optional[Role]:
+        snapshot = await self.get(db)
+        role = snapshot.lookup(role_id, role_name)
+        if role is None and time.monotonic() - snapshot.loaded_at > MISS_RELOAD_INTERVAL:
+            async with self._lock:
+                if self._snapshot is snapshot:
+                    await self.refresh(db)
+            role = self._snapshot.lookup(role_id, role_name)
+        return role
+
+    async def role_name(self, db, role_id: Optional[int]) -> str:
+        """Name for a user's role_id, falling back to the default role."""
+        role = await self.lookup(db, role_id=role_id) if role_id is not None else None
+        return role.role_name if role else DEFAULT_ROLE
+
+    def invalidate(self) -> None:
+        self._snapshot = None
+
+    async def load_at_startup(self, session_factory) -> None:
+        # Not fatal: without a DB at boot the first request loads it instead
+        db = session_factory()
+        try:
+            await self.refresh(ThreadedSession(db))
+        except Exception:
+            logger.exception("Could not preload roles; they will load on first use")
+        finally:
+            await run_in_threadpool(db.close)
+
+
+role_registry = RoleRegistry()
@@ -0,0 +1,344 @@
+"""
+Object storage for uploaded course assets.
+
+Uploads are written through an ObjectWriter one chunk at a time, so a file
+is never held in memory or spooled to a temp file first:
+
+    writer = storage.open_writer("courses/12/video/intro.mp4", "video/mp4")
+    for chunk in chunks:
+        writer.write(chunk)
+    stored = writer.commit()     # or writer.abort() on failure
+
+Every writer hashes the bytes as they pass (sha256, on the writer's thread).
+Opened with `object_name=None`, a writer is content-addressed: the object is
+named after its hash (`content_object_name`) on commit, and if an object with
+that hash already exists the new copy is dropped and the existing one
+returned (`deduplicated=True`). Identical files are then stored once however
+many courses use them. Content-addressed objects may be shared, so failure
+cleanup never deletes them (see `deletable`); an orphan is reused by the next
+upload of the same file.
+
+Backends:
+
+- GCSStorage: resumable upload to GCS_BUCKET (google-cloud-storage).
+- LocalStorage: files under STORAGE_LOCAL_ROOT, for offline development and
+  tests. Objects only appear under their final name on commit.
+
+Reads go through `signed_url`, a short-lived URL the client fetches directly
+(see app/services/asset_delivery.py). Writers and signing are blocking;
+callers run them off the event loop (see app/services/upload_pipeline.py). `get_storage()` returns the backend chosen
+by STORAGE_BACKEND.
+"""
+import hashlib
+import hmac
+import os
+import tempfile
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlencode
+
+from app.core.config import (
+    GCS_BUCKET,
+    GCS_UPLOAD_CHUNK_SIZE,
+    MEDIA_URL_SECRET,
+    STORAGE_BACKEND,
+    STORAGE_LOCAL_BASE_URL,
+    STORAGE_LOCAL_ROOT,
+)
+
+
+CONTENT_PREFIX = "courses/objects/sha256"
+
+
+class StorageError(Exception):
+    pass
+
+
+def content_object_name(sha256: str) -> str:
+    # Two-character fan-out keeps local directories small
+    return f"{CONTENT_PREFIX}/{sha256[:2]}/{sha256}"
+
+
+@dataclass(frozen=True)
+class StoredObject:
+    bucket: str
+    object_name: str
+    public_url: str
+    content_type: str
+    size: int
+    sha256: str = ""
+    content_addressed: bool = False
+    deduplicated: bool = False
+
+    @property
+    def deletable(self) -> bool:
+        """Whether failure cleanup may delete it (it is not possibly shared)."""
+        return not self.content_addressed
+
+
+class ObjectWriter:
+    object_name: Optional[str]
+    content_type: str
+
+    def __init__(self):
+        self._hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> None:
+        self._hash.update(data)
+        self.size += len(data)
+        self._write(data)
+
+    def _write(self, data: bytes) -> None:
+        raise NotImplementedError
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def commit(self) -> StoredObject:
+        raise NotImplementedError
+
+    def abort(self) -> None:
+        raise NotImplementedError
+
+
+class StorageBackend:
+    name = "base"
+    bucket = ""
+
+    def open_writer(self, object_name: Optional[str], content_type: str) -> ObjectWriter:
+        """`object_name=None` names the object by its content hash on commit."""
+        raise NotImplementedError
+
+    def exists(self, object_name: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, object_name: str) -> None:
+        raise NotImplementedError
+
+    def signed_url(self, object_name: str, expires_at: int, user_id: int, content_type: str) -> str:
+        """A URL that reads the object without other credentials until `expires_at` (epoch seconds)."""
+        raise NotImplementedError
+
+
+# --- Local filesystem ---
+
+class _LocalWriter(ObjectWriter):
+    def __init__(self, backend: "LocalStorage", object_name: Optional[str], content_type: str):
+        super().__init__()
+        self.backend = backend
+        self.object_name = object_name
+        self.content_type = content_type
+        # Content-addressed files are spooled next to where they will land
+        parent = backend.path_for(object_name or f"{CONTENT_PREFIX}/.incoming").parent
+        parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=parent, prefix=".upload-", suffix=".part")
+        self._tmp = Path(tmp)
+        self._file = os.fdopen(fd, "wb")
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def commit(self) -> StoredObject:
+        self._file.close()
+        object_name = self.object_name or content_object_name(self.sha256)
+        path = self.backend.path_for(object_name)
+        deduplicated = self.object_name is None and path.exists()
+        if deduplicated:
+            self._tmp.unlink()
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(self._tmp, path)
+        return StoredObject(
+            bucket=self.backend.bucket,
+            object_name=object_name,
+            public_url=self.backend.public_url(object_name),
+            content_type=self.content_type,
+            size=self.size,
+            sha256=self.sha256,
+            content_addressed=self.object_name is None,
+            deduplicated=deduplicated,
+        )
+
+    def abort(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+    bucket = "local"
+
+    def __init__(
+        self,
+        root: str = STORAGE_LOCAL_ROOT,
+        base_url: str = STORAGE_LOCAL_BASE_URL,
+        secret: str = MEDIA_URL_SECRET,
+    ):
+        self.root = Path(root).resolve()
+        self.base_url = base_url.rstrip("/")
+        self._secret = secret.encode()
+
+    def path_for(self, object_name: str) -> Path:
+        path = (self.root / object_name).resolve()
+        # Object names come from user file names; never escape the root
+        if self.root not in path.parents:
+            raise StorageError(f"Invalid object name: {object_name}")
+        return path
+
+    def public_url(self, object_name: str) -> str:
+        return f"{self.base_url}/{object_name}"
+
+    def open_writer(self, object_name: Optional[str], content_type: str) -> ObjectWriter:
+        return _LocalWriter(self, object_name, content_type)
+
+    def exists(self, object_name: str) -> bool:
+        return self.path_for(object_name).is_file()
+
+    def delete(self, object_name: str) -> None:
+        self.path_for(object_name).unlink(missing_ok=True)
+
+    def _signature(self, object_name: str, expires_at: int, user_id: int, content_type: str) -> str:
+        message = f"{object_name}\n{expires_at}\n{user_id}\n{content_type}".encode()
+        return hmac.new(self._secret, message, hashlib.sha256).hexdigest()
+
+    def signed_url(self, object_name: str, expires_at: int, user_id: int, content_type: str) -> str:
+        # Served by GET /media/{object_name}, which checks the signature
+        query = urlencode({
+            "u": user_id,
+            "exp": expires_at,
+            "type": content_type,
+            "sig": self._signature(object_name, expires_at, user_id, content_type),
+        })
+        return f"{self.public_url(object_name)}?{query}"
+
+    def verify_signature(self, object_name: str, expires_at: int, user_id: int, content_type: str, sig: str) -> bool:
+        expected = self._signature(object_name, expires_at, user_id, content_type)
+        return hmac.compare_digest(expected, sig)
+
+
+# --- Google Cloud Storage ---
+
+class _GCSWriter(ObjectWriter):
+    def __init__(self, backend: "GCSStorage", object_name: Optional[str], content_type: str):
+        super().__init__()
+        self.backend = backend
+        self.object_name = object_name
+        self.content_type = content_type
+        # The hash is only known at the end, so content-addressed uploads go to
+        # a temporary name and are moved server-side on commit
+        upload_name = object_name or f"{CONTENT_PREFIX}/incoming/{uuid.uuid4().hex}"
+        self.blob = backend.get_bucket().blob(upload_name, chunk_size=GCS_UPLOAD_CHUNK_SIZE)
+        # Resumable upload: each chunk_size of data is sent as it fills
+        self._file = self.blob.open("wb", content_type=content_type, ignore_flush=True)
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+
+    def _publish(self, object_name: str) -> bool:
+        """Move the temporary upload to `object_name`; False if it already existed."""
+        from google.api_core.exceptions import PreconditionFailed
+
+        target = self.backend.get_bucket().blob(object_name)
+        try:
+            if target.exists():
+                return False
+            # if_generation_match=0: never overwrite a concurrent identical upload
+            token, _, _ = target.rewrite(self.blob, if_generation_match=0)
+            while token is not None:
+                token, _, _ = target.rewrite(self.blob, token=token, if_generation_match=0)
+            return True
+        except PreconditionFailed:
+            return False
+        finally:
+            self.backend.delete(self.blob.name)
+
+    def commit(self) -> StoredObject:
+        self._file.close()
+        object_name = self.object_name or content_object_name(self.sha256)
+        deduplicated = self.object_name is None and not self._publish(object_name)
+        return StoredObject(
+            bucket=self.backend.bucket,
+            object_name=object_name,
+            public_url=f"https://storage.googleapis.com/{self.backend.bucket}/{object_name}",
+            content_type=self.content_type,
+            size=self.size,
+            sha256=self.sha256,
+            content_addressed=self.object_name is None,
+            deduplicated=deduplicated,
+        )
+
+    def abort(self) -> None:
+        # Closing would finalize the object; an unfinished resumable session
+        # is simply never completed and expires on the GCS side
+        self._file = None
+
+
+class GCSStorage(StorageBackend):
+    name = "gcs"
+
+    def __init__(self, bucket: str = GCS_BUCKET):
+        if not bucket:
+            raise StorageError("GCS_BUCKET is not set")
+        self.bucket = bucket
+        self._bucket = None
+
+    def get_bucket(self):
+        if self._bucket is None:
+            from google.cloud import storage
+
+            self._bucket = storage.Client().bucket(self.bucket)
+        return self._bucket
+
+    def open_writer(self, object_name: Optional[str], content_type: str) -> ObjectWriter:
+        return _GCSWriter(self, object_name, content_type)
+
+    def exists(self, object_name: str) -> bool:
+        return self.get_bucket().blob(object_name).exists()
+
+    def signed_url(self, object_name: str, expires_at: int, user_id: int, content_type: str) -> str:
+        import google.auth.credentials
+        from google.auth.transport.requests import Request
+
+        # V4 URLs cannot be bound to a user; callers cache them per user
+        kwargs = {
+            "version": "v4",
+            "method": "GET",
+            "expiration": datetime.fromtimestamp(expires_at, tz=timezone.utc),
+            "response_type": content_type,
+        }
+        credentials = self.get_bucket().client._credentials
+        if not isinstance(credentials, google.auth.credentials.Signing):
+            # Cloud Run / GCE credentials hold no private key: sign through
+            # the IAM signBlob API with the service account's token instead
+            if not credentials.valid:
+                credentials.refresh(Request())
+            kwargs.update(service_account_email=credentials.service_account_email, access_token=credentials.token)
+        return self.get_bucket().blob(object_name).generate_signed_url(**kwargs)
+
+    def delete(self, object_name: str) -> None:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.get_bucket().blob(object_name).delete()
+        except NotFound:
+            pass
+
+
+_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "gcs":
+            _storage = GCSStorage()
+        elif STORAGE_BACKEND == "local":
+            _storage = LocalStorage()
+        else:
+            raise StorageError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+    return _storage
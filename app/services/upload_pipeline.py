@@ -0,0 +1,223 @@
+"""
+Streaming multipart uploads straight into object storage.
+
+`request.form()` spools every file to a temp file before the handler runs.
+`stream_multipart` instead parses the body as it arrives and hands each
+file part's bytes to an UploadPipe, whose writer runs on a dedicated bounded
+executor:
+
+    request body --parser--> UploadPipe queue --upload thread--> storage
+
+Parts arrive one after another in the body, so while part N is still being
+read, parts before it keep uploading in the background. Memory stays
+bounded: at most STORAGE_UPLOAD_WORKERS uploads run at once and each pipe
+buffers at most STORAGE_PIPE_DEPTH chunks. When both are full, reading the
+request body pauses, which pushes back on the client.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from app.core.config import STORAGE_PIPE_DEPTH, STORAGE_UPLOAD_WORKERS
+from app.services.storage import StorageBackend, StorageError, StoredObject
+
+# Non-file form fields (e.g. the JSON payload) are held in memory
+MAX_FIELD_BYTES = 1024 * 1024
+
+upload_executor = ThreadPoolExecutor(max_workers=max(1, STORAGE_UPLOAD_WORKERS), thread_name_prefix="upload")
+
+_EOF = object()
+
+
+class UploadPipe:
+    """Feeds one object's bytes from the event loop to a writer on the upload executor."""
+
+    def __init__(self, storage: StorageBackend, object_name: Optional[str], content_type: str):
+        """`object_name=None` stores the object under its content hash (see storage.py)."""
+        self.storage = storage
+        self.object_name = object_name
+        self.label = object_name or "content-addressed object"
+        self.content_type = content_type
+        self._loop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, STORAGE_PIPE_DEPTH))
+        self._aborted = False
+        self.closed = False
+        self.future = self._loop.run_in_executor(upload_executor, self._run)
+
+    def _next_chunk(self):
+        return asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop).result()
+
+    def _run(self) -> StoredObject:
+        writer = self.storage.open_writer(self.object_name, self.content_type)
+        try:
+            while True:
+                chunk = self._next_chunk()
+                if self._aborted:
+                    raise StorageError(f"Upload of {self.label} aborted")
+                if chunk is _EOF:
+                    return writer.commit()
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+
+    async def send(self, data) -> None:
+        try:
+            self._queue.put_nowait(data)
+            return
+        except asyncio.QueueFull:
+            pass
+        # Wait for room, unless the writer dies first (it would never drain)
+        put = asyncio.ensure_future(self._queue.put(data))
+        await asyncio.wait({put, self.future}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self.future.result()
+            raise StorageError(f"Upload of {self.label} stopped early")
+
+    async def close(self) -> None:
+        """No more data; the upload finishes in the background (await `future`)."""
+        if not self.closed:
+            self.closed = True
+            await self.send(_EOF)
+
+    def abort(self) -> None:
+        self._aborted = True
+        try:
+            # Wakes a writer waiting on an empty queue; a full queue is
+            # drained by the writer, which then sees the flag
+            self._queue.put_nowait(_EOF)
+        except asyncio.QueueFull:
+            pass
+
+
+async def settle(pipes: list[UploadPipe]) -> list[StoredObject]:
+    """
+    Wait for every pipe; all-or-nothing.
+
+    On any failure the objects that did upload are deleted and the first
+    error is raised, so no orphaned objects are left behind. Content-addressed
+    objects are kept: another course may use them.
+    """
+    results = await asyncio.gather(*(pipe.future for pipe in pipes), return_exceptions=True)
+    errors = [r for r in results if isinstance(r, BaseException)]
+    if errors:
+        await delete_objects([r for r in results if isinstance(r, StoredObject)], pipes)
+        raise errors[0]
+    return results
+
+
+async def abort_all(pipes: list[UploadPipe]) -> None:
+    for pipe in pipes:
+        pipe.abort()
+    results = await asyncio.gather(*(pipe.future for pipe in pipes), return_exceptions=True)
+    await delete_objects([r for r in results if isinstance(r, StoredObject)], pipes)
+
+
+async def delete_objects(stored: list[StoredObject], pipes: list[UploadPipe]) -> None:
+    stored = [obj for obj in stored if obj.deletable]
+    if not stored or not pipes:
+        return
+    storage = pipes[0].storage
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(loop.run_in_executor(upload_executor, storage.delete, obj.object_name) for obj in stored),
+        return_exceptions=True,
+    )
+
+
+async def stream_multipart(
+    request: Request,
+    on_field: Callable[[str, str], Awaitable[None]],
+    on_file: Callable[[str, str, str], Awaitable[UploadPipe]],
+) -> list[UploadPipe]:
+    """
+    Parse a multipart/form-data body as it streams in.
+
+    `on_field(name, value)` is awaited for each complete non-file field.
+    `on_file(name, filename, content_type)` is awaited when a file part starts
+    and returns the UploadPipe that receives its bytes. Returns every pipe
+    opened, in order; their uploads may still be running. On error all pipes
+    are aborted and their objects removed before the exception propagates.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Expected multipart/form-data")
+
+    # The parser is push-based with sync callbacks: record events per chunk
+    # and replay them here, where we can await.
+    events: list[tuple] = []
+    parser = MultipartParser(
+        boundary,
+        callbacks={
+            "on_part_begin": lambda: events.append(("begin",)),
+            "on_header_field": lambda d, s, e: events.append(("hfield", d[s:e])),
+            "on_header_value": lambda d, s, e: events.append(("hvalue", d[s:e])),
+            "on_header_end": lambda: events.append(("hend",)),
+            "on_headers_finished": lambda: events.append(("headers",)),
+            "on_part_data": lambda d, s, e: events.append(("data", bytes(d[s:e]))),
+            "on_part_end": lambda: events.append(("end",)),
+        },
+    )
+
+    pipes: list[UploadPipe] = []
+    state: dict = {}
+
+    async def replay():
+        for event in events:
+            kind = event[0]
+            if kind == "begin":
+                state.clear()
+                state.update(headers={}, field=b"", pipe=None, hname=b"", hvalue=b"")
+            elif kind == "hfield":
+                state["hname"] += event[1]
+            elif kind == "hvalue":
+                state["hvalue"] += event[1]
+            elif kind == "hend":
+                state["headers"][state["hname"].lower()] = state["hvalue"]
+                state["hname"], state["hvalue"] = b"", b""
+            elif kind == "headers":
+                _, options = parse_options_header(state["headers"].get(b"content-disposition", b""))
+                name = options.get(b"name", b"").decode("utf-8", "replace")
+                filename = options.get(b"filename")
+                state["name"] = name
+                if filename is not None:
+                    ctype = state["headers"].get(b"content-type", b"application/octet-stream")
+                    pipe = await on_file(name, filename.decode("utf-8", "replace"), ctype.decode("latin-1"))
+                    pipes.append(pipe)
+                    state["pipe"] = pipe
+            elif kind == "data":
+                if state["pipe"] is not None:
+                    await state["pipe"].send(event[1])
+                else:
+                    state["field"] += event[1]
+                    if len(state["field"]) > MAX_FIELD_BYTES:
+                        raise HTTPException(status_code=413, detail=f"Form field {state['name']} is too large")
+            elif kind == "end":
+                if state["pipe"] is not None:
+                    await state["pipe"].close()
+                else:
+                    await on_field(state["name"], state["field"].decode("utf-8"))
+        events.clear()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            await replay()
+        parser.finalize()
+        await replay()
+        if any(not pipe.closed for pipe in pipes):
+            raise HTTPException(status_code=400, detail="Incomplete multipart body")
+    except BaseException:
+        await abort_all(pipes)
+        raise
+    return pipes
+
@@ -0,0 +1,35 @@
+import re
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+# YouTube video ids are 11 characters from [A-Za-z0-9_-]
+_VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+_YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com"}
+
+
+def extract_youtube_id(url: str) -> Optional[str]:
+    """
+    Video id from the usual YouTube URL shapes, or None.
+
+    Handles watch?v=, youtu.be/<id>, /embed/<id>, /shorts/<id> and /live/<id>.
+    """
+    if not url:
+        return None
+    parsed = urlparse(url.strip() if "://" in url else "https://" + url.strip())
+    host = (parsed.hostname or "").lower()
+
+    candidate = None
+    if host == "youtu.be":
+        candidate = parsed.path.lstrip("/").split("/")[0]
+    elif host in _YOUTUBE_HOSTS or host == "www.youtube-nocookie.com":
+        if parsed.path == "/watch":
+            candidate = (parse_qs(parsed.query).get("v") or [None])[0]
+        else:
+            parts = parsed.path.strip("/").split("/")
+            if len(parts) >= 2 and parts[0] in {"embed", "shorts", "live", "v"}:
+                candidate = parts[1]
+
+    if candidate and _VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
@@ -0,0 +1,86 @@
+"""
+Load benchmark for the hot read endpoints at 50, 200 and 1000 concurrent connections.
+
+Start the API twice, once per engine, and point this script at each run:
+
+  DB_ASYNC=false uvicorn app.main:app --port 8000
+  python scripts/bench_async_load.py --base-url http://127.0.0.1:8000 --student-id 12 --parent-id 7
+
+  DB_ASYNC=true uvicorn app.main:app --port 8000
+  python scripts/bench_async_load.py --base-url http://127.0.0.1:8000 --student-id 12 --parent-id 7
+
+Each level sends --requests requests spread over the given concurrency and
+reports throughput, p50/p99 latency and error count.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+def build_paths(args):
+    paths = ["/api/v1/courses?limit=50&active_only=true"]
+    if args.student_id:
+        paths += [
+            f"/api/v1/student/dashboard?student_id={args.student_id}",
+            f"/api/v1/student/courses?student_id={args.student_id}",
+        ]
+    if args.parent_id:
+        paths.append(f"/api/v1/parent/children?parent_id={args.parent_id}")
+    return paths
+
+
+async def run_level(client, paths, concurrency, total, headers):
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            path = paths[i % len(paths)]
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, headers=headers)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return total / elapsed, statistics.median(latencies), p99, errors
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--student-id", type=int)
+    parser.add_argument("--parent-id", type=int)
+    parser.add_argument("--token", help="Bearer token, if the endpoints require one")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--levels", default="50,200,1000")
+    args = parser.parse_args()
+
+    paths = build_paths(args)
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+
+    print(f"{'conns':>6} {'req/s':>9} {'p50 (ms)':>10} {'p99 (ms)':>10} {'errors':>7}")
+    for concurrency in (int(level) for level in args.levels.split(",")):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+            rps, p50, p99, errors = await run_level(
+                client, paths, concurrency, max(args.requests, concurrency), headers
+            )
+        print(f"{concurrency:>6} {rps:>9.1f} {p50 * 1000:>10.1f} {p99 * 1000:>10.1f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,49 @@
+"""
+Per-request bearer-token verification overhead.
+
+Compares a full jose jwt.decode (HMAC check + JSON parse + claim checks) on
+every request against decode_access_token, which caches the decoded
+identity by token hash until exp. "cold" uses a fresh token per call, i.e.
+the cost of the first request a token makes.
+
+  python scripts/bench_jwt_verify.py
+  ITERATIONS=200000 python scripts/bench_jwt_verify.py
+"""
+import os
+import sys
+import time
+
+from jose import jwt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.auth import JWT_ALG, JWT_SECRET, create_access_token
+from app.core.security import decode_access_token, token_cache
+
+ITERATIONS = int(os.getenv("ITERATIONS", "50000"))
+
+
+def bench(label, fn, items):
+    start = time.perf_counter()
+    for item in items:
+        fn(item)
+    elapsed = time.perf_counter() - start
+    per_call = elapsed / len(items) * 1_000_000
+    print(f"  {label:<28} {per_call:>8.2f} µs/req  ({len(items) / elapsed:>10.0f} req/s)")
+    return per_call
+
+
+token = create_access_token("42", {"role": "student", "email": "bench@example.test"})
+fresh_tokens = [
+    create_access_token(str(n), {"role": "student", "email": "bench@example.test"})
+    for n in range(min(ITERATIONS, 20000))
+]
+
+print(f"=== {ITERATIONS} verifications ===")
+raw = bench("jwt.decode every request", lambda t: jwt.decode(t, JWT_SECRET, algorithms=[JWT_ALG]), [token] * ITERATIONS)
+token_cache.clear()
+bench("decode_access_token (cold)", decode_access_token, fresh_tokens)
+cached = bench("decode_access_token (cached)", decode_access_token, [token] * ITERATIONS)
+
+print(f"\n✓ Cached verification is {raw / cached:.1f}x cheaper than decoding every request")
+print(f"  cache: {token_cache.stats()}")
@@ -0,0 +1,100 @@
+"""
+Login-storm benchmark: a burst of concurrent logins while another client
+keeps polling a cheap read endpoint.
+
+Before the dedicated KDF pool, password hashing ran on Starlette's shared
+threadpool, so a burst of logins made every sync endpoint queue behind it.
+With the pool, the probe latency should stay flat, and logins beyond
+KDF_WORKERS + KDF_QUEUE_MAX get a fast 503 with Retry-After instead of
+timing out.
+
+  uvicorn app.main:app --port 8000
+  python scripts/bench_login_storm.py --email demo@example.com --password secret
+
+Use a real account so each login pays the full hash cost (a wrong password
+costs the same, an unknown email does not hash at all).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+
+import httpx
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))] if values else 0.0
+
+
+async def login_storm(client, args, statuses, latencies):
+    counter = iter(range(args.logins))
+
+    async def worker():
+        for _ in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.post(
+                    "/api/v1/auth/login", json={"email": args.email, "password": args.password}
+                )
+                statuses[response.status_code] += 1
+            except httpx.HTTPError:
+                statuses["error"] += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+
+
+async def probe(client, path, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get(path)
+        except httpx.HTTPError:
+            pass
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--probe-path", default="/api/v1/roles")
+    args = parser.parse_args()
+
+    limits = httpx.Limits(max_connections=args.concurrency + 5)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=120) as client:
+        baseline = []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, args.probe_path, stop, baseline))
+        await asyncio.sleep(2)
+        stop.set()
+        await task
+
+        statuses, login_latencies, probe_latencies = Counter(), [], []
+        stop = asyncio.Event()
+        task = asyncio.create_task(probe(client, args.probe_path, stop, probe_latencies))
+        started = time.perf_counter()
+        await login_storm(client, args, statuses, login_latencies)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await task
+
+    print(f"=== {args.logins} logins, {args.concurrency} concurrent ({elapsed:.1f}s) ===")
+    print(f"  statuses: {dict(statuses)}")
+    print(f"  login p50 {statistics.median(login_latencies) * 1000:.1f} ms, "
+          f"p99 {percentile(login_latencies, 0.99) * 1000:.1f} ms")
+    print(f"\n=== probe {args.probe_path} ===")
+    print(f"  idle   p50 {statistics.median(baseline) * 1000:.1f} ms, "
+          f"p99 {percentile(baseline, 0.99) * 1000:.1f} ms")
+    print(f"  storm  p50 {statistics.median(probe_latencies) * 1000:.1f} ms, "
+          f"p99 {percentile(probe_latencies, 0.99) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
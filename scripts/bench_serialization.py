@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: course list serialization, current path vs fast path.
+
+  current: CourseOut.model_validate(obj).model_dump(by_alias=True) per ORM row,
+           then FastAPI's jsonable_encoder + JSONResponse
+  fast:    column-projected tuples -> RowProjection.to_dicts -> ORJSONResponse
+
+Runs without a database on synthetic rows:
+  python scripts/bench_serialization.py
+"""
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import ORJSONResponse, RowProjection
+from app.db.models import Course
+from app.schemas.course import CourseOut
+
+PROJECTION = RowProjection(CourseOut, Course)
+SOURCE_ATTRS = [column.key for column in PROJECTION.columns]
+
+
+def make_objects(n):
+    base = datetime(2025, 1, 1, 9, 30)
+    return [
+        SimpleNamespace(
+            course_id=i,
+            course_name=f"Tajweed Level {i}",
+            description="Rules of recitation with weekly practice sessions. " * 3,
+            price=Decimal("49.99"),
+            level="beginner",
+            category="Quran",
+            chapter_count=12,
+            min_age=7,
+            age_max=12,
+            is_active=True,
+            created_at=base + timedelta(minutes=i),
+        )
+        for i in range(n, 0, -1)
+    ]
+
+
+def current_path(objects):
+    output = [CourseOut.model_validate(c).model_dump(by_alias=True) for c in objects]
+    return JSONResponse(jsonable_encoder(output)).body
+
+
+def fast_path(rows):
+    return ORJSONResponse(PROJECTION.to_dicts(rows)).body
+
+
+def main():
+    print(f"{'rows':>6} {'current (ms)':>14} {'fast (ms)':>11} {'speedup':>9}")
+    for n in (50, 200, 1000):
+        objects = make_objects(n)
+        rows = [tuple(getattr(o, attr) for attr in SOURCE_ATTRS) for o in objects]
+        number = max(5, 2000 // n)
+
+        current = min(timeit.repeat(lambda: current_path(objects), number=number, repeat=5)) / number
+        fast = min(timeit.repeat(lambda: fast_path(rows), number=number, repeat=5)) / number
+        print(f"{n:>6} {current * 1000:>14.3f} {fast * 1000:>11.3f} {current / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
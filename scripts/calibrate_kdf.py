@@ -0,0 +1,56 @@
+"""
+Pick PBKDF2_ROUNDS for this machine.
+
+Times pbkdf2_sha256 at a few round counts, fits the (linear) cost per round
+and prints the round count that hits the target hash latency. Run it on the
+deployment hardware (e.g. the Cloud Run instance size) and set the result as
+the PBKDF2_ROUNDS env var; stored hashes at other counts are upgraded on the
+next successful login.
+
+  python scripts/calibrate_kdf.py
+  python scripts/calibrate_kdf.py --target-ms 150 --repeat 7
+"""
+import argparse
+import statistics
+import time
+
+from passlib.hash import pbkdf2_sha256
+
+SAMPLE_ROUNDS = (10_000, 50_000, 100_000)
+
+
+def time_hash(rounds: int, repeat: int) -> float:
+    hasher = pbkdf2_sha256.using(rounds=rounds)
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        hasher.hash("calibration-password")
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--target-ms", type=float, default=100.0, help="hash latency to aim for")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-rounds", type=int, default=29_000, help="never go below this")
+    args = parser.parse_args()
+
+    print(f"{'rounds':>8} {'median ms':>10}")
+    per_round = []
+    for rounds in SAMPLE_ROUNDS:
+        seconds = time_hash(rounds, args.repeat)
+        per_round.append(seconds / rounds)
+        print(f"{rounds:>8} {seconds * 1000:>10.2f}")
+
+    cost = statistics.median(per_round)
+    # Round to the nearest 1000 so the env value stays readable
+    rounds = max(args.min_rounds, int(args.target_ms / 1000 / cost / 1000) * 1000)
+    check = time_hash(rounds, args.repeat)
+
+    print(f"\nTarget {args.target_ms:.0f} ms -> {rounds} rounds (measured {check * 1000:.1f} ms)")
+    print(f"\nPBKDF2_ROUNDS={rounds}")
+
+
+if __name__ == "__main__":
+    main()